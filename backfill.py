@@ -0,0 +1,172 @@
+"""Re-run detection over historical captures after a prompt or detector change.
+
+Results are written to ``item_history_versions`` under an ``analysis_runs``
+row labelled with ``--version``, leaving the live inventory untouched. Work is
+committed in bulk transactions, and those committed rows double as the
+checkpoint: re-running with the same version skips every image that already
+has a successful result, so an interrupted backfill resumes where it stopped.
+API calls go through the same ``DetectionPool`` rate limiter as the live
+monitor, shared across processes.
+
+Usage:
+    python3 backfill.py --version prompt-v2 [--workers 2] [--batch_size 50] [--include_unlinked]
+"""
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from camera_config import DEFAULT_CAMERA_ID
+from capture_identify import DETECTION_MODEL, DETECTION_PROMPT
+from database.operations import (
+    get_or_create_analysis_run, finish_analysis_run, get_analysed_images,
+    get_event_images, get_stored_image_paths, save_analysis_results
+)
+from detection_pool import DetectionPool, API_WORKERS
+
+# Configuration
+IMAGE_ROOT = "imgs"
+DEFAULT_BATCH_SIZE = 50
+PROGRESS_INTERVAL = 10  # Seconds between progress reports
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Re-analyse stored fridge images with the current detector')
+    parser.add_argument('--version', required=True,
+                        help='Label for this analysis (reuse it to resume an interrupted run)')
+    parser.add_argument('--workers', type=int, default=API_WORKERS,
+                        help='Concurrent detection requests (the request rate is shared with the monitor)')
+    parser.add_argument('--batch_size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='Results committed per database transaction')
+    parser.add_argument('--include_unlinked', action='store_true',
+                        help=f'Also analyse images under {IMAGE_ROOT}/ that the database does not know about')
+    parser.add_argument('--limit', type=int, default=None,
+                        help='Stop after this many images')
+    return parser.parse_args()
+
+
+def find_unlinked_images(known_paths, root=IMAGE_ROOT):
+    """Full-size images on disk that the database does not reference (thumbnails are skipped)"""
+    known = {os.path.normpath(path) for path in known_paths}
+    thumbs_dir = os.path.join(root, 'thumbs')
+    for dirpath, dirnames, filenames in os.walk(root):
+        if os.path.normpath(dirpath).startswith(os.path.normpath(thumbs_dir)):
+            continue
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if not filename.lower().endswith(('.jpg', '.jpeg')):
+                continue
+            path = os.path.join(dirpath, filename)
+            if os.path.normpath(path) not in known:
+                yield path
+
+
+def analyse(pool, event_id, image_path, camera_id):
+    try:
+        data = pool.detect(image_path)
+        return {'event_id': event_id, 'image_path': image_path, 'camera_id': camera_id,
+                'items': data.get('items', [])}
+    except Exception as e:
+        return {'event_id': event_id, 'image_path': image_path, 'camera_id': camera_id,
+                'error': str(e)}
+
+
+class Progress:
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.started = time.time()
+        self.last_report = 0
+
+    def update(self, result):
+        self.done += 1
+        if result.get('error'):
+            self.failed += 1
+
+    def report(self, force=False):
+        now = time.time()
+        if not force and now - self.last_report < PROGRESS_INTERVAL:
+            return
+        self.last_report = now
+        elapsed = max(now - self.started, 1e-6)
+        rate = self.done / elapsed
+        remaining = self.total - self.done
+        eta = remaining / rate if rate else float('inf')
+        eta_text = time.strftime('%H:%M:%S', time.gmtime(eta)) if eta != float('inf') else '--:--:--'
+        print(f"{self.done}/{self.total} images ({self.failed} failed), "
+              f"{rate * 60:.1f} images/min, ETA {eta_text}")
+
+
+def main():
+    args = parse_args()
+    from openai import OpenAI
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY environment variable not set")
+
+    prompt_sha256 = hashlib.sha256(DETECTION_PROMPT.encode('utf-8')).hexdigest()
+    run_id, created = get_or_create_analysis_run(args.version, DETECTION_MODEL, prompt_sha256)
+    done = get_analysed_images(run_id)
+    print(f"{'Starting' if created else 'Resuming'} analysis '{args.version}' (run {run_id}), "
+          f"{len(done)} images already analysed")
+
+    events = get_event_images()
+    work = [(event_id, path, camera_id) for event_id, path, camera_id in events
+            if path not in done and os.path.exists(path)]
+    if args.include_unlinked:
+        # Stored blobs include door-open key frames, which only event_images links to
+        known = [path for _, path, _ in events] + get_stored_image_paths()
+        work += [(None, path, DEFAULT_CAMERA_ID) for path in find_unlinked_images(known) if path not in done]
+    if args.limit is not None:
+        work = work[:args.limit]
+
+    pool = DetectionPool(OpenAI(api_key=api_key), workers=args.workers)
+    progress = Progress(len(work))
+    pending = []
+    in_flight = set()
+    queue = iter(work)
+    # Keep only a bounded number of jobs submitted so memory stays flat for large backlogs
+    max_in_flight = args.workers * 2
+
+    try:
+        while True:
+            while len(in_flight) < max_in_flight:
+                job = next(queue, None)
+                if job is None:
+                    break
+                in_flight.add(pool.submit(analyse, pool, *job))
+            if not in_flight:
+                break
+
+            completed, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in completed:
+                result = future.result()
+                progress.update(result)
+                pending.append(result)
+
+            if len(pending) >= args.batch_size:
+                save_analysis_results(run_id, pending)
+                pending = []
+            progress.report()
+    except KeyboardInterrupt:
+        print("Interrupted, saving completed results (re-run with the same --version to resume)")
+        for future in in_flight:
+            future.cancel()
+    finally:
+        if pending:
+            save_analysis_results(run_id, pending)
+        pool.shutdown(wait=False)
+        progress.report(force=True)
+
+    if progress.done == progress.total and not progress.failed:
+        finish_analysis_run(run_id)
+        print(f"Analysis '{args.version}' complete")
+    elif progress.failed:
+        print(f"{progress.failed} image(s) failed; re-run with the same --version to retry them")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Startup-time benchmark for each entry point.
+
+Measures, in fresh interpreters so nothing is cached between runs:
+
+* import latency of every entry-point module (median of ``--repeat`` runs),
+  plus the slowest imports reported by ``python -X importtime``;
+* first-frame latency: time from process start to the first frame read from
+  the camera (monitor), and to the first JPEG served on ``/video_feed``
+  (live feed).
+
+Usage:
+    python3 bench_startup.py [--repeat 5] [--camera-index 0] [--skip-camera]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+ENTRY_POINTS = [
+    'capture_identify',
+    'light_capture_identify',
+    'multi_monitor',
+    'live_feed',
+    'control_panel',
+]
+LIVE_FEED_URL = "http://127.0.0.1:5000/video_feed"
+FIRST_FRAME_TIMEOUT = 60
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Reports the first successful read, mirroring what the monitor does before it
+# can evaluate the light level; the parent times it from process launch
+MONITOR_FIRST_FRAME = """
+import light_capture_identify
+cap = light_capture_identify.setup_camera({index})
+while True:
+    ret, frame = cap.read()
+    if ret:
+        break
+print('first frame', flush=True)
+cap.release()
+"""
+
+
+def _run_python(args, **kwargs):
+    return subprocess.run([sys.executable] + args, cwd=HERE, capture_output=True, text=True, **kwargs)
+
+
+def time_import(module, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = _run_python(['-c', f'import {module}'])
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1]
+        samples.append(elapsed)
+    return statistics.median(samples), None
+
+
+def slowest_imports(module, top=5):
+    """Parse -X importtime output and return the heaviest (cumulative us, name) pairs"""
+    result = _run_python(['-X', 'importtime', '-c', f'import {module}'])
+    rows = []
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)', line)
+        if match and len(match.group(3)) <= 2:  # Top-level imports only
+            rows.append((int(match.group(2)), match.group(4)))
+    return sorted(rows, reverse=True)[:top]
+
+
+def monitor_first_frame(camera_index):
+    # Timed from the parent, like live_feed_first_frame, so interpreter start is included
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', MONITOR_FIRST_FRAME.format(index=camera_index)],
+                               cwd=HERE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    timer = threading.Timer(FIRST_FRAME_TIMEOUT, process.kill)
+    timer.start()
+    try:
+        line = process.stdout.readline()
+        elapsed = time.perf_counter() - start
+        if line.strip() != 'first frame':
+            process.wait()
+            stderr = process.stderr.read().strip().splitlines()
+            raise RuntimeError(stderr[-1] if stderr else f"monitor exited with code {process.returncode}")
+        return elapsed
+    finally:
+        timer.cancel()
+        process.wait(timeout=10)
+
+
+def live_feed_first_frame():
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, 'live_feed.py'], cwd=HERE,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < FIRST_FRAME_TIMEOUT:
+            if process.poll() is not None:
+                raise RuntimeError(f"live_feed exited with code {process.returncode}")
+            try:
+                with urllib.request.urlopen(LIVE_FEED_URL, timeout=FIRST_FRAME_TIMEOUT) as response:
+                    # The first part ends once its JPEG end-of-image marker arrives
+                    buffer = b''
+                    while b'\xff\xd9' not in buffer:
+                        chunk = response.read(4096)
+                        if not chunk:
+                            break
+                        buffer += chunk
+                    return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.05)  # Server not listening yet
+        raise RuntimeError("Timed out waiting for the first frame")
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure startup latency of fridge-sight entry points')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per import measurement')
+    parser.add_argument('--camera-index', type=int, default=0, help='Camera used for first-frame latency')
+    parser.add_argument('--skip-camera', action='store_true', help='Only measure import latency')
+    args = parser.parse_args()
+
+    print(f"Import latency (median of {args.repeat}, includes interpreter start)")
+    baseline, _ = time_import('sys', args.repeat)
+    print(f"  {'<interpreter>':<24} {baseline * 1000:8.1f} ms")
+    for module in ENTRY_POINTS:
+        elapsed, error = time_import(module, args.repeat)
+        if error:
+            print(f"  {module:<24} failed: {error}")
+            continue
+        print(f"  {module:<24} {elapsed * 1000:8.1f} ms")
+        for cumulative, name in slowest_imports(module):
+            print(f"      {name:<28} {cumulative / 1000:8.1f} ms")
+
+    if args.skip_camera:
+        return
+
+    print("\nFirst-frame latency")
+    for name, measure in [('light_capture_identify', lambda: monitor_first_frame(args.camera_index)),
+                          ('live_feed', live_feed_first_frame)]:
+        try:
+            print(f"  {name:<24} {measure() * 1000:8.1f} ms")
+        except Exception as e:
+            print(f"  {name:<24} failed: {str(e)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""In-memory brightness time series with batched, downsampled persistence.
+
+Samples are appended to preallocated arrays (float64 timestamps, float32
+levels) and written to the database in one transaction per batch, never per
+sample. Each flush stores the raw samples plus closed per-minute aggregates;
+raw rows are kept for ``RAW_RETENTION`` and minute rows for
+``MINUTE_RETENTION``. Door open/close transitions are derived from the same
+samples so door-usage analytics need no extra polling.
+"""
+import logging
+import time
+
+import numpy as np
+
+from camera_config import DEFAULT_CAMERA_ID
+from database.models import RAW_RETENTION, MINUTE_RETENTION
+from database.operations import save_brightness_batch
+
+# Configuration
+FLUSH_BATCH_SIZE = 240           # Samples buffered before a flush (2 minutes at 2 Hz)
+FLUSH_INTERVAL = 120             # Seconds before a partial batch is flushed anyway
+
+logger = logging.getLogger(__name__)
+
+
+class BrightnessSeries:
+    def __init__(self, threshold, camera_id=DEFAULT_CAMERA_ID, capacity=FLUSH_BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL):
+        self.threshold = threshold
+        self.camera_id = camera_id
+        self.flush_interval = flush_interval
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.levels = np.zeros(capacity, dtype=np.float32)
+        self.count = 0
+        self.last_flush = time.time()
+        # Aggregate of the current, still-open minute: [minute, sum, count, min, max]
+        self.pending_minute = None
+        self.door_open = False
+        self.door_opened_at = None
+
+    def append(self, timestamp, level):
+        """Record a sample; returns 'open', 'close' or None for the door transition it causes"""
+        if self.count == len(self.levels):
+            self.flush()
+        self.timestamps[self.count] = timestamp
+        self.levels[self.count] = level
+        self.count += 1
+
+        transition = None
+        is_lit = level > self.threshold
+        if is_lit and not self.door_open:
+            self.door_open = True
+            self.door_opened_at = timestamp
+            transition = 'open'
+        elif not is_lit and self.door_open:
+            self.door_open = False
+            transition = 'close'
+
+        if timestamp - self.last_flush >= self.flush_interval:
+            self.flush()
+        return transition
+
+    def open_duration(self, now):
+        """Seconds the door has been (or was last) open, measured from the opening sample"""
+        return now - self.door_opened_at if self.door_opened_at is not None else 0.0
+
+    def _minute_aggregates(self, timestamps, levels, close_minute=False):
+        """Fold the batch into per-minute aggregates; returns the minutes that are now closed"""
+        groups = []
+        if len(levels):
+            minutes = (timestamps // 60).astype(np.int64)
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(minutes)) + 1))
+            sums = np.add.reduceat(levels, starts, dtype=np.float64)
+            counts = np.diff(np.append(starts, len(levels)))
+            mins = np.minimum.reduceat(levels, starts)
+            maxs = np.maximum.reduceat(levels, starts)
+            groups = [[int(minutes[s]), float(sums[i]), int(counts[i]), float(mins[i]), float(maxs[i])]
+                      for i, s in enumerate(starts)]
+
+        if self.pending_minute is not None:
+            if groups and groups[0][0] == self.pending_minute[0]:
+                minute, total, count, low, high = groups[0]
+                pending = self.pending_minute
+                groups[0] = [minute, pending[1] + total, pending[2] + count,
+                             min(pending[3], low), max(pending[4], high)]
+            else:
+                groups.insert(0, self.pending_minute)
+
+        # The last minute may still receive samples, so hold it back
+        self.pending_minute = None if close_minute or not groups else groups.pop()
+        return [
+            {'timestamp': minute * 60.0, 'mean': total / count, 'min': low, 'max': high, 'samples': count}
+            for minute, total, count, low, high in groups
+        ]
+
+    def flush(self, close_minute=False):
+        """Persist buffered samples in a single transaction; close_minute also writes the open minute"""
+        now = time.time()
+        self.last_flush = now
+        if self.count == 0 and (not close_minute or self.pending_minute is None):
+            return
+        timestamps = self.timestamps[:self.count]
+        levels = self.levels[:self.count]
+        try:
+            minutes = self._minute_aggregates(timestamps, levels, close_minute)
+            samples = list(zip(timestamps.tolist(), levels.tolist()))
+            save_brightness_batch(self.camera_id, samples, minutes,
+                                  now - RAW_RETENTION, now - MINUTE_RETENTION)
+        except Exception as e:
+            # Drop the batch rather than grow without bound while the DB is unavailable
+            logger.error(f"Dropping {self.count} brightness samples: {str(e)}")
+        finally:
+            self.count = 0
@@ -0,0 +1,35 @@
+"""Camera / fridge configuration shared by the monitor, supervisor and live feed.
+
+Cameras are listed in ``cameras.json``::
+
+    [
+      {"id": "kitchen", "index": 0},
+      {"id": "garage", "index": 1, "name": "Garage fridge"}
+    ]
+
+When the file is absent a single camera at index 0 with id ``default`` is used,
+which matches the original single-fridge setup.
+"""
+import json
+import os
+
+CAMERA_CONFIG_FILE = os.getenv("FRIDGE_CAMERA_CONFIG", "cameras.json")
+DEFAULT_CAMERA_ID = "default"
+
+
+def load_cameras(path=CAMERA_CONFIG_FILE):
+    if not os.path.exists(path):
+        return [{'id': DEFAULT_CAMERA_ID, 'index': 0, 'name': 'Fridge'}]
+
+    with open(path) as f:
+        cameras = json.load(f)
+
+    seen = set()
+    for camera in cameras:
+        if 'id' not in camera or 'index' not in camera:
+            raise ValueError(f"Invalid camera entry {camera} - 'id' and 'index' are required")
+        if camera['id'] in seen:
+            raise ValueError(f"Duplicate camera id '{camera['id']}'")
+        seen.add(camera['id'])
+        camera.setdefault('name', camera['id'])
+    return cameras
@@ -1,25 +1,48 @@
-import cv2
 import base64
 import json
 import os
-import argparse
-import subprocess
-from openai import OpenAI
 from datetime import datetime
 import time
+from detection_log import DetectionLog, write_snapshot
+
+# cv2, openai, argparse, the image store and image sync are imported where
+# they are used: the monitor and detection pool import this module only for
+# the OpenAI helpers and should not pay for the rest at startup.
 
 # Configuration
 JSON_OUTPUT_FILE = "detected_objects.json"
 CAMERA_INDEX = 0
-IMAGE_DIR = "imgs"
 MAX_RETRIES = 3
 RETRY_DELAY = 2
 DEFAULT_NUM_IMAGES = 1
 DEFAULT_REMOTE_USER = "luke"
 DEFAULT_REMOTE_HOST = "fridgecam.local"
 DEFAULT_LOCAL_PATH = "/Users/luke/cursor-projs/sight/images"
+REMOTE_IMAGE_DIR = "fridge_camera/imgs"  # Relative to the remote home directory
+DETECTION_MODEL = "gpt-4o"
+DETECTION_PROMPT = """Analyze this fridge image and identify visible items.
+    Return ONLY a JSON object with this exact format:
+    {
+      "items": [
+        {
+          "name": "string",       // Item name (e.g., "Milk", "Juice")
+          "quantity": number,     // Number of items
+          "confidence": number    // Confidence score between 0-1
+        }
+      ]
+    }"""
+
+_detection_log = None
+
+def get_detection_log():
+    global _detection_log
+    if _detection_log is None:
+        _detection_log = DetectionLog()
+    return _detection_log
 
 def parse_args():
+    import argparse
+    
     parser = argparse.ArgumentParser(description='Capture and analyze fridge images')
     parser.add_argument('--num_images', '-n', type=int, default=DEFAULT_NUM_IMAGES,
                       help='Number of images to capture')
@@ -34,8 +57,8 @@ def parse_args():
     return parser.parse_args()
 
 def capture_image(camera_index=0, attempts=3):
-    # Create imgs directory if it doesn't exist
-    os.makedirs(IMAGE_DIR, exist_ok=True)
+    import cv2
+    from image_store import get_image_store
     
     for attempt in range(attempts):
         try:
@@ -52,11 +75,8 @@ def capture_image(camera_index=0, attempts=3):
             if not ret or frame is None:
                 raise RuntimeError("Frame capture failed")
             
-            # Generate output path with timestamp
-            timestamp = datetime.now().strftime('%y%m%d%H%M%S')
-            output_path = os.path.join(IMAGE_DIR, f"{timestamp}.jpg")
-            
-            cv2.imwrite(output_path, frame)
+            # Store content-addressed so same-second captures cannot collide
+            _, output_path = get_image_store().put_frame(frame)
             return output_path
             
         except Exception as e:
@@ -77,23 +97,11 @@ def ask_openai_for_objects(base64_image, client=None, max_retries=MAX_RETRIES):
     if client is None:
         raise ValueError("OpenAI client must be provided")
         
-    prompt_text = """Analyze this fridge image and identify visible items.
-    Return ONLY a JSON object with this exact format:
-    {
-      "items": [
-        {
-          "name": "string",       // Item name (e.g., "Milk", "Juice")
-          "quantity": number,     // Number of items
-          "confidence": number    // Confidence score between 0-1
-        }
-      ]
-    }"""
-
     messages = [
         {
             "role": "user",
             "content": [
-                {"type": "text", "text": prompt_text},
+                {"type": "text", "text": DETECTION_PROMPT},
                 {
                     "type": "image_url",
                     "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}
@@ -105,7 +113,7 @@ def ask_openai_for_objects(base64_image, client=None, max_retries=MAX_RETRIES):
     for attempt in range(max_retries):
         try:
             response = client.chat.completions.create(
-                model="gpt-4o",
+                model=DETECTION_MODEL,
                 messages=messages,
                 max_tokens=300,
                 temperature=0.3
@@ -178,32 +186,30 @@ def update_json_file(data, output_file=JSON_OUTPUT_FILE):
     data['timestamp'] = datetime.now().isoformat()
     
     try:
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
-        
-        with open(output_file, "w") as f:
-            json.dump(data, f, indent=2)
+        # Keep the full history in the append-only log, and the latest
+        # result as an atomically swapped snapshot for existing readers
+        get_detection_log().append(data)
+        write_snapshot(data, output_file)
             
     except Exception as e:
         raise RuntimeError(f"Failed to save JSON: {str(e)}")
 
 def transfer_images(remote_user, remote_host, local_path):
+    from image_sync import SSHTransport, sync_images
+    
     try:
-        # Ensure local directory exists
-        os.makedirs(local_path, exist_ok=True)
+        # Only new or changed files are copied; see image_sync for details
+        transport = SSHTransport(remote_user, remote_host, REMOTE_IMAGE_DIR)
+        print(f"Syncing {remote_user}@{remote_host}:{REMOTE_IMAGE_DIR} to {local_path}/imgs")
         
-        # Construct scp command
-        cmd = f"scp -r {remote_user}@{remote_host}:~/fridge_camera/imgs/ {local_path}/"
-        print(f"Executing transfer command: {cmd}")
+        summary = sync_images(transport, os.path.join(local_path, 'imgs'))
         
-        # Execute transfer
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            print(f"Transfer failed: {result.stderr}")
+        if summary['failed']:
+            print(f"Transfer failed for {len(summary['failed'])} file(s)")
             return False
             
-        print("Images transferred successfully")
+        print(f"Images transferred successfully: {summary['transferred']} new, "
+              f"{summary['skipped']} already up to date")
         return True
         
     except Exception as e:
@@ -211,6 +217,9 @@ def transfer_images(remote_user, remote_host, local_path):
         return False
 
 def main():
+    from openai import OpenAI
+    from image_store import get_image_store
+    
     args = parse_args()
     
     try:
@@ -248,6 +257,9 @@ def main():
         if args.transfer_imgs:
             print("\nTransferring images to local machine...")
             transfer_images(args.remote_user, args.remote_host, args.local_path)
+        
+        # Let the background worker finish thumbnails before exiting
+        get_image_store().wait()
             
     except Exception as e:
         print(f"Error in main execution: {str(e)}")
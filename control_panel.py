@@ -1,19 +1,30 @@
-from flask import Flask, render_template_string, Response, jsonify
-import subprocess
-import threading
+from flask import Flask, render_template_string, Response, jsonify, request, send_file, abort, url_for
 import os
-import signal
-import psutil
-from database.operations import get_current_inventory
+from supervisor import Supervisor
+from profiler import profile_process, collapsed_to_tree, MAX_DURATION, ProfilerNotReady, ProfileInProgress
+from database.operations import get_current_inventory, get_recent_captures, get_blob, get_brightness, get_door_usage
+from camera_config import DEFAULT_CAMERA_ID, load_cameras
+from database.models import RAW_RETENTION, get_engine
+from datetime import datetime, timedelta
+import time
 
 app = Flask(__name__)
 
-# Track running processes
-processes = {
-    'light_capture': None,
-    'live_feed': None
+SERVICE_SCRIPTS = {
+    'light_capture': 'light_capture_identify.py',
+    'multi_monitor': 'multi_monitor.py',
+    'live_feed': 'live_feed.py'
 }
 
+# Both monitors open the configured cameras, so only one may run at a time
+CONFLICTING_SERVICES = {
+    'light_capture': 'multi_monitor',
+    'multi_monitor': 'light_capture'
+}
+
+# Supervise child services: health checks, restarts and resource sampling
+supervisor = Supervisor({name: ['python3', script] for name, script in SERVICE_SCRIPTS.items()})
+
 HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html lang="en">
@@ -65,6 +76,8 @@ HTML_TEMPLATE = """
         }
         #live-feed {
             margin-top: 20px;
+        }
+        .live-feed img {
             max-width: 100%;
             height: auto;
         }
@@ -79,6 +92,11 @@ HTML_TEMPLATE = """
                     document.getElementById('light-capture-status').className = 
                         'status ' + (data.light_capture ? 'running' : 'stopped');
                     
+                    document.getElementById('multi-monitor-status').textContent = 
+                        data.multi_monitor ? 'Running' : 'Stopped';
+                    document.getElementById('multi-monitor-status').className = 
+                        'status ' + (data.multi_monitor ? 'running' : 'stopped');
+                    
                     document.getElementById('live-feed-status').textContent = 
                         data.live_feed ? 'Running' : 'Stopped';
                     document.getElementById('live-feed-status').className = 
@@ -94,6 +112,9 @@ HTML_TEMPLATE = """
             fetch(`/control/${service}/${action}`)
                 .then(response => response.json())
                 .then(data => {
+                    if (data.error) {
+                        alert(data.error);
+                    }
                     updateStatus();
                 });
         }
@@ -113,12 +134,81 @@ HTML_TEMPLATE = """
         <button class="button start" onclick="controlService('light_capture', 'start')">Start</button>
         <button class="button stop" onclick="controlService('light_capture', 'stop')">Stop</button>
         
+        <h2>All Cameras (cameras.json)</h2>
+        <div id="multi-monitor-status" class="status">Checking...</div>
+        <button class="button start" onclick="controlService('multi_monitor', 'start')">Start</button>
+        <button class="button stop" onclick="controlService('multi_monitor', 'stop')">Stop</button>
+        
         <h2>Live Feed</h2>
         <div id="live-feed-status" class="status">Checking...</div>
         <button class="button start" onclick="controlService('live_feed', 'start')">Start</button>
         <button class="button stop" onclick="controlService('live_feed', 'stop')">Stop</button>
         
-        <img id="live-feed" src="http://localhost:5000/video_feed" style="display: none;">
+        <div id="live-feed" style="display: none;">
+            {% for camera in cameras %}
+            <figure class="live-feed">
+                <img src="http://localhost:5000/video_feed/{{ camera.id | urlencode }}" alt="{{ camera.name }}">
+                <figcaption>{{ camera.name }}</figcaption>
+            </figure>
+            {% endfor %}
+        </div>
+        
+        <h2>Service Health</h2>
+        <div id="health-container" class="status">Loading...</div>
+        
+        <script>
+            function formatBytes(bytes) {
+                return (bytes / (1024 * 1024)).toFixed(1) + ' MB';
+            }
+            
+            function refreshHealth() {
+                fetch('/health')
+                    .then(response => response.json())
+                    .then(data => {
+                        const cell = 'style="padding: 8px; border: 1px solid #ddd;"';
+                        const rows = Object.entries(data).map(([name, svc]) => {
+                            const res = svc.resources || {};
+                            const state = svc.running ? 'Running' :
+                                (svc.next_restart_in !== null ? `Restarting in ${svc.next_restart_in.toFixed(0)}s` : 'Stopped');
+                            return `
+                                <tr>
+                                    <td ${cell}>${name}</td>
+                                    <td ${cell}>${state}</td>
+                                    <td ${cell}>${svc.heartbeat_age !== null ? svc.heartbeat_age.toFixed(0) + 's ago' : '-'}</td>
+                                    <td ${cell}>${svc.restarts}</td>
+                                    <td ${cell}>${res.cpu_percent !== undefined ? res.cpu_percent.toFixed(1) + '%' : '-'}</td>
+                                    <td ${cell}>${res.rss !== undefined ? formatBytes(res.rss) : '-'}</td>
+                                    <td ${cell}>${res.num_fds !== undefined ? res.num_fds : '-'}</td>
+                                    <td ${cell}>${res.num_threads !== undefined ? res.num_threads : '-'}</td>
+                                </tr>`;
+                        }).join('');
+                        document.getElementById('health-container').innerHTML = `
+                            <table style="width:100%; border-collapse: collapse; margin-top: 10px;">
+                                <thead>
+                                    <tr style="background-color: #f5f5f5;">
+                                        <th ${cell}>Service</th>
+                                        <th ${cell}>State</th>
+                                        <th ${cell}>Heartbeat</th>
+                                        <th ${cell}>Restarts</th>
+                                        <th ${cell}>CPU</th>
+                                        <th ${cell}>RSS</th>
+                                        <th ${cell}>FDs</th>
+                                        <th ${cell}>Threads</th>
+                                    </tr>
+                                </thead>
+                                <tbody>${rows}</tbody>
+                            </table>`;
+                    })
+                    .catch(error => {
+                        console.error('Error fetching health:', error);
+                        document.getElementById('health-container').innerHTML = 
+                            '<p style="color: red;">Error loading service health</p>';
+                    });
+            }
+            
+            document.addEventListener('DOMContentLoaded', refreshHealth);
+            setInterval(refreshHealth, 5000);
+        </script>
         
         <h2>Current Inventory</h2>
         <div id="inventory-container" class="status">Loading...</div>
@@ -170,64 +260,183 @@ HTML_TEMPLATE = """
             // Refresh inventory every 30 seconds
             setInterval(refreshInventory, 30000);
         </script>
+        
+        <h2>Recent Captures</h2>
+        <div id="gallery-container" class="status">Loading...</div>
+        
+        <script>
+            function refreshGallery() {
+                fetch('/gallery')
+                    .then(response => response.json())
+                    .then(data => {
+                        const container = document.getElementById('gallery-container');
+                        if (data.length === 0) {
+                            container.innerHTML = '<p>No captures yet</p>';
+                            return;
+                        }
+                        container.innerHTML = data.map(capture => `
+                            <figure style="display: inline-block; margin: 5px; text-align: center;">
+                                <img src="${capture.thumbnail_url}" loading="lazy" style="width: 160px;">
+                                <figcaption>${new Date(capture.timestamp).toLocaleString()}</figcaption>
+                            </figure>
+                        `).join('');
+                    })
+                    .catch(error => {
+                        console.error('Error fetching gallery:', error);
+                        document.getElementById('gallery-container').innerHTML = 
+                            '<p style="color: red;">Error loading captures</p>';
+                    });
+            }
+            
+            document.addEventListener('DOMContentLoaded', refreshGallery);
+            setInterval(refreshGallery, 60000);
+        </script>
     </div>
 </body>
 </html>
 """
 
-def is_process_running(pid):
-    try:
-        return psutil.pid_exists(pid)
-    except:
-        return False
-
 @app.route('/')
 def index():
-    return render_template_string(HTML_TEMPLATE)
+    return render_template_string(HTML_TEMPLATE, cameras=load_cameras())
 
 @app.route('/status')
 def status():
-    return jsonify({
-        'light_capture': processes['light_capture'] is not None and 
-                        is_process_running(processes['light_capture'].pid),
-        'live_feed': processes['live_feed'] is not None and 
-                    is_process_running(processes['live_feed'].pid)
-    })
+    return jsonify({name: supervisor.is_running(name) for name in SERVICE_SCRIPTS})
+
+@app.route('/health')
+def health():
+    return jsonify(supervisor.status())
+
+@app.route('/health/<service>/history')
+def health_history(service):
+    if service not in SERVICE_SCRIPTS:
+        return jsonify({'error': 'Invalid service'}), 400
+    return jsonify(supervisor.history(service))
+
+def is_local_request():
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+@app.route('/profile/<service>')
+def profile(service):
+    # Profiling exposes code paths and costs CPU, so only allow it from this host
+    if not is_local_request():
+        abort(403)
+    if service not in SERVICE_SCRIPTS:
+        return jsonify({'error': 'Invalid service'}), 400
+    
+    pids = supervisor.process_tree(service)
+    if not pids:
+        return jsonify({'error': f'{service} is not running'}), 409
+    # Defaults to the service's main process; pass ?pid= for e.g. one camera process
+    pid = request.args.get('pid', pids[0], type=int)
+    if pid not in pids:
+        return jsonify({'error': f'pid {pid} does not belong to {service}', 'pids': pids}), 400
+    
+    seconds = min(request.args.get('seconds', 10, type=float), MAX_DURATION)
+    try:
+        collapsed = profile_process(pid, seconds)
+    except (ProfilerNotReady, ProfileInProgress) as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    if request.args.get('format') == 'json':
+        return jsonify(collapsed_to_tree(collapsed))
+    return Response(collapsed, mimetype='text/plain')
 
 @app.route('/control/<service>/<action>')
 def control(service, action):
-    if service not in processes:
+    if service not in SERVICE_SCRIPTS:
         return jsonify({'error': 'Invalid service'}), 400
     
     if action == 'start':
-        if processes[service] is None or not is_process_running(processes[service].pid):
-            script = 'light_capture_identify.py' if service == 'light_capture' else 'live_feed.py'
-            processes[service] = subprocess.Popen(['python3', script])
+        other = CONFLICTING_SERVICES.get(service)
+        if other and supervisor.is_desired(other):
+            return jsonify({'error': f'Stop {other} first; it uses the same cameras'}), 409
+        supervisor.start(service)
             
     elif action == 'stop':
-        if processes[service] and is_process_running(processes[service].pid):
-            os.kill(processes[service].pid, signal.SIGTERM)
-            processes[service] = None
+        supervisor.stop(service)
     
     return jsonify({'status': 'success'})
 
 @app.route('/inventory')
 def inventory():
     try:
-        items = get_current_inventory()
+        items = get_current_inventory(request.args.get('camera_id'))
         return jsonify(items)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/brightness')
+def brightness():
+    try:
+        camera_id = request.args.get('camera_id', DEFAULT_CAMERA_ID)
+        minutes = request.args.get('minutes', 60, type=int)
+        end = time.time()
+        start = end - minutes * 60
+        # Raw samples only exist for the last hour; older ranges use the per-minute tier
+        raw = minutes * 60 <= RAW_RETENTION
+        return jsonify({
+            'camera_id': camera_id,
+            'resolution': 'raw' if raw else 'minute',
+            'samples': get_brightness(camera_id, start, end, raw=raw)
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/door_usage')
+def door_usage():
+    try:
+        hours = request.args.get('hours', 24, type=int)
+        since = datetime.utcnow() - timedelta(hours=hours)
+        return jsonify(get_door_usage(since, request.args.get('camera_id')))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/gallery')
+def gallery():
+    try:
+        limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+        captures = get_recent_captures(limit)
+        for capture in captures:
+            capture['thumbnail_url'] = url_for('thumbnail', sha256=capture['sha256'])
+        return jsonify(captures)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/thumbnail/<sha256>')
+def thumbnail(sha256):
+    blob = get_blob(sha256)
+    if blob is None:
+        abort(404)
+    thumb_path = blob['thumbnail_path']
+    if not thumb_path or not os.path.exists(thumb_path):
+        # The monitor's background worker can be stopped before it gets to a
+        # blob, so fall back to a (reduced-scale) decode here, once per blob
+        if not os.path.exists(blob['path']):
+            abort(404)
+        from image_store import get_image_store
+        try:
+            thumb_path = get_image_store().make_thumbnail(sha256)
+        except Exception:
+            abort(404)
+    response = send_file(os.path.abspath(thumb_path), mimetype='image/jpeg')
+    # Content-addressed, so the thumbnail for a hash never changes
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
 def cleanup():
-    for process in processes.values():
-        if process and is_process_running(process.pid):
-            os.kill(process.pid, signal.SIGTERM)
+    supervisor.shutdown()
 
 if __name__ == '__main__':
     # Register cleanup handler
     import atexit
     atexit.register(cleanup)
-    
+
+    # Bring the schema up to date once, before any supervised service starts
+    get_engine()
+
     # Run the control panel on port 8000 (since live_feed uses 5000)
     app.run(host='0.0.0.0', port=8000, threaded=True) 
\ No newline at end of file
@@ -0,0 +1,105 @@
+"""Schema migrations, applied once per database.
+
+The schema version is kept in SQLite's ``PRAGMA user_version``. ``migrate``
+runs only the steps newer than the stored version, so a database that is
+already current costs a single pragma read at startup. Run
+``python -m database.migrations`` to apply migrations explicitly (e.g. at
+deploy time) instead of on the first query.
+"""
+from sqlalchemy import create_engine, inspect, text
+import logging
+
+from .models import Base, DATABASE_URL, BrightnessSample, BrightnessMinute, AnalysisRun, ItemHistoryVersion
+
+logger = logging.getLogger(__name__)
+
+
+def _create_tables(conn):
+    Base.metadata.create_all(conn)
+
+
+def _add_columns(conn, table_name, column_names):
+    """Add model columns missing from an existing table (no-op for tables created by step 1)"""
+    inspector = inspect(conn)
+    if not inspector.has_table(table_name):
+        return
+    existing = {column['name'] for column in inspector.get_columns(table_name)}
+    table = Base.metadata.tables[table_name]
+    for name in column_names:
+        if name in existing:
+            continue
+        column = table.columns[name]
+        column_type = column.type.compile(conn.dialect)
+        default = column.default.arg if column.default is not None and column.default.is_scalar else None
+        ddl = f'ALTER TABLE {table_name} ADD COLUMN {name} {column_type}'
+        if isinstance(default, str):
+            ddl += f" DEFAULT '{default}'"
+        conn.execute(text(ddl))
+
+
+def _add_camera_columns(conn):
+    _add_columns(conn, 'fridge_events', ['camera_id'])
+    _add_columns(conn, 'fridge_items', ['camera_id'])
+
+
+def _add_clip_column(conn):
+    _add_columns(conn, 'fridge_events', ['clip_path'])
+
+
+def _add_brightness_series(conn):
+    Base.metadata.create_all(conn, tables=[BrightnessSample.__table__, BrightnessMinute.__table__])
+    _add_columns(conn, 'fridge_events', ['duration'])
+
+
+def _add_analysis_versions(conn):
+    Base.metadata.create_all(conn, tables=[AnalysisRun.__table__, ItemHistoryVersion.__table__])
+
+
+def _create_missing_indexes(conn):
+    # create_all skips tables that already exist and ADD COLUMN creates no
+    # index, so upgraded databases lack indexes on the added columns
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+# Ordered; a step's position + 1 is the schema version it produces
+MIGRATIONS = [
+    _create_tables,
+    _add_camera_columns,
+    _add_clip_column,
+    _add_brightness_series,
+    _add_analysis_versions,
+    _create_missing_indexes,
+]
+
+
+def get_version(conn):
+    return conn.execute(text('PRAGMA user_version')).scalar()
+
+
+def migrate(engine):
+    with engine.connect() as conn:
+        # pysqlite issues no BEGIN before PRAGMA or DDL, so take the write lock
+        # explicitly: concurrent first starts then migrate one at a time, and
+        # each re-reads the version once it holds the lock
+        conn = conn.execution_options(isolation_level='AUTOCOMMIT')
+        if get_version(conn) >= len(MIGRATIONS):
+            return len(MIGRATIONS)
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+        try:
+            version = get_version(conn)
+            for step_version, step in enumerate(MIGRATIONS[version:], start=version + 1):
+                logger.info(f"Applying migration {step_version}: {step.__name__}")
+                step(conn)
+                conn.execute(text(f'PRAGMA user_version = {step_version}'))
+            conn.exec_driver_sql('COMMIT')
+        except Exception:
+            conn.exec_driver_sql('ROLLBACK')
+            raise
+    return len(MIGRATIONS)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    print(f"Database at schema version {migrate(create_engine(DATABASE_URL))}")
@@ -2,10 +2,18 @@ from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
+import os
+import threading
+
+DATABASE_URL = os.getenv('FRIDGE_DATABASE_URL', 'sqlite:///fridge_state.db')
+RAW_RETENTION = 60 * 60              # Seconds raw brightness samples are kept
+MINUTE_RETENTION = 7 * 24 * 60 * 60  # Seconds per-minute brightness aggregates are kept
 
 Base = declarative_base()
-engine = create_engine('sqlite:///fridge_state.db')
-Session = sessionmaker(bind=engine)
+# Bound lazily by get_engine() so importing the models does no I/O
+Session = sessionmaker()
+_engine = None
+_engine_lock = threading.Lock()
 
 class FridgeEvent(Base):
     __tablename__ = 'fridge_events'
@@ -13,8 +21,11 @@ class FridgeEvent(Base):
     id = Column(Integer, primary_key=True)
     timestamp = Column(DateTime, default=datetime.utcnow)
     event_type = Column(String)  # 'door_open', 'door_close', 'item_detected'
+    camera_id = Column(String, default='default', index=True)
     image_path = Column(String, nullable=True)
     light_level = Column(Float, nullable=True)
+    clip_path = Column(String, nullable=True)
+    duration = Column(Float, nullable=True)  # Seconds the door was open, set on 'door_close'
 
 class FridgeItem(Base):
     __tablename__ = 'fridge_items'
@@ -26,6 +37,7 @@ class FridgeItem(Base):
     last_seen = Column(DateTime, default=datetime.utcnow)
     confidence = Column(Float)
     is_present = Column(Boolean, default=True)
+    camera_id = Column(String, default='default', index=True)
 
 class ItemHistory(Base):
     __tablename__ = 'item_history'
@@ -37,5 +49,82 @@ class ItemHistory(Base):
     quantity_change = Column(Integer)
     timestamp = Column(DateTime, default=datetime.utcnow)
 
-# Create all tables
-Base.metadata.create_all(engine) 
\ No newline at end of file
+class ImageBlob(Base):
+    __tablename__ = 'image_blobs'
+    
+    id = Column(Integer, primary_key=True)
+    sha256 = Column(String, unique=True, index=True)
+    path = Column(String)
+    thumbnail_path = Column(String, nullable=True)
+    size = Column(Integer)
+    width = Column(Integer)
+    height = Column(Integer)
+    created = Column(DateTime, default=datetime.utcnow)
+
+class EventImage(Base):
+    __tablename__ = 'event_images'
+    
+    id = Column(Integer, primary_key=True)
+    event_id = Column(Integer, index=True)
+    blob_sha256 = Column(String, index=True)
+
+class BrightnessSample(Base):
+    __tablename__ = 'brightness_samples'
+    
+    id = Column(Integer, primary_key=True)
+    camera_id = Column(String, index=True)
+    timestamp = Column(Float, index=True)  # Unix seconds
+    level = Column(Float)
+
+class BrightnessMinute(Base):
+    __tablename__ = 'brightness_minutes'
+    
+    id = Column(Integer, primary_key=True)
+    camera_id = Column(String, index=True)
+    timestamp = Column(Float, index=True)  # Unix seconds at the start of the minute
+    mean = Column(Float)
+    min = Column(Float)
+    max = Column(Float)
+    samples = Column(Integer)
+
+class AnalysisRun(Base):
+    __tablename__ = 'analysis_runs'
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(String, unique=True)  # Label for the prompt/detector being evaluated
+    model = Column(String)
+    prompt_sha256 = Column(String)
+    started = Column(DateTime, default=datetime.utcnow)
+    finished = Column(DateTime, nullable=True)
+
+class ItemHistoryVersion(Base):
+    __tablename__ = 'item_history_versions'
+    
+    id = Column(Integer, primary_key=True)
+    run_id = Column(Integer, index=True)
+    event_id = Column(Integer, nullable=True, index=True)
+    image_path = Column(String)
+    camera_id = Column(String, default='default')
+    name = Column(String, nullable=True)  # Null row records an image with no detected items
+    quantity = Column(Integer, nullable=True)
+    confidence = Column(Float, nullable=True)
+    error = Column(String, nullable=True)
+    timestamp = Column(DateTime, default=datetime.utcnow)
+
+def get_engine():
+    """Create the engine and bring the schema up to date on first use"""
+    global _engine
+    if _engine is not None:
+        return _engine
+    with _engine_lock:
+        if _engine is None:
+            from .migrations import migrate
+            engine = create_engine(DATABASE_URL)
+            migrate(engine)
+            Session.configure(bind=engine)
+            _engine = engine
+    return _engine
+
+def get_session():
+    get_engine()
+    return Session()
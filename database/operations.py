@@ -1,17 +1,23 @@
-from .models import Session, FridgeEvent, FridgeItem, ItemHistory
+from .models import get_session, FridgeEvent, FridgeItem, ItemHistory, ImageBlob, EventImage, BrightnessSample, BrightnessMinute, AnalysisRun, ItemHistoryVersion
+from sqlalchemy import func
 from datetime import datetime
 import logging
+from camera_config import DEFAULT_CAMERA_ID
 
 logger = logging.getLogger(__name__)
 
-def record_fridge_event(event_type, image_path=None, light_level=None):
+def record_fridge_event(event_type, image_path=None, light_level=None, camera_id=DEFAULT_CAMERA_ID,
+                        clip_path=None, duration=None):
     """Record a fridge event (door open/close, detection)"""
-    session = Session()
+    session = get_session()
     try:
         event = FridgeEvent(
             event_type=event_type,
             image_path=image_path,
-            light_level=light_level
+            light_level=light_level,
+            camera_id=camera_id,
+            clip_path=clip_path,
+            duration=duration
         )
         session.add(event)
         session.commit()
@@ -23,12 +29,28 @@ def record_fridge_event(event_type, image_path=None, light_level=None):
     finally:
         session.close()
 
-def update_items(detected_items, event_id):
+def set_event_clip(event_id, clip_path):
+    """Attach a recorded door-open clip to an existing event"""
+    session = get_session()
+    try:
+        session.query(FridgeEvent).filter_by(id=event_id).update({'clip_path': clip_path})
+        session.commit()
+    except Exception as e:
+        logger.error(f"Failed to set event clip: {e}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def update_items(detected_items, event_id, camera_id=DEFAULT_CAMERA_ID):
     """Update fridge inventory based on detected items"""
-    session = Session()
+    session = get_session()
     try:
-        # Get current inventory
-        current_items = {item.name: item for item in session.query(FridgeItem).filter_by(is_present=True).all()}
+        # Get current inventory for this fridge
+        current_items = {
+            item.name: item
+            for item in session.query(FridgeItem).filter_by(is_present=True, camera_id=camera_id).all()
+        }
         
         # Process detected items
         for item_data in detected_items:
@@ -58,7 +80,8 @@ def update_items(detected_items, event_id):
                 new_item = FridgeItem(
                     name=name,
                     quantity=quantity,
-                    confidence=confidence
+                    confidence=confidence,
+                    camera_id=camera_id
                 )
                 session.add(new_item)
                 session.flush()  # Get the ID
@@ -79,19 +102,287 @@ def update_items(detected_items, event_id):
     finally:
         session.close()
 
-def get_current_inventory():
-    """Get current fridge inventory"""
-    session = Session()
+def get_current_inventory(camera_id=None):
+    """Get current fridge inventory, optionally for a single camera/fridge"""
+    session = get_session()
     try:
+        query = session.query(FridgeItem).filter_by(is_present=True)
+        if camera_id is not None:
+            query = query.filter_by(camera_id=camera_id)
         return [
             {
                 'name': item.name,
                 'quantity': item.quantity,
                 'first_seen': item.first_seen,
                 'last_seen': item.last_seen,
-                'confidence': item.confidence
+                'confidence': item.confidence,
+                'camera_id': item.camera_id
+            }
+            for item in query.all()
+        ]
+    finally:
+        session.close() 
+
+def record_image_blob(sha256, path, size, width, height):
+    """Index a stored image blob; returns (created, needs_thumbnail)"""
+    session = get_session()
+    try:
+        blob = session.query(ImageBlob).filter_by(sha256=sha256).first()
+        if blob is not None:
+            return False, blob.thumbnail_path is None
+        session.add(ImageBlob(sha256=sha256, path=path, size=size, width=width, height=height))
+        session.commit()
+        return True, True
+    except Exception as e:
+        logger.error(f"Failed to record image blob: {e}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def set_blob_thumbnail(sha256, thumbnail_path):
+    """Attach a generated thumbnail to an image blob"""
+    session = get_session()
+    try:
+        session.query(ImageBlob).filter_by(sha256=sha256).update({'thumbnail_path': thumbnail_path})
+        session.commit()
+    except Exception as e:
+        logger.error(f"Failed to set blob thumbnail: {e}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def link_event_image(event_id, sha256):
+    """Associate a fridge event with the image blob it captured"""
+    session = get_session()
+    try:
+        session.add(EventImage(event_id=event_id, blob_sha256=sha256))
+        session.commit()
+    except Exception as e:
+        logger.error(f"Failed to link event image: {e}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def get_blob(sha256):
+    """Get a single image blob by hash"""
+    session = get_session()
+    try:
+        blob = session.query(ImageBlob).filter_by(sha256=sha256).first()
+        if blob is None:
+            return None
+        return {
+            'sha256': blob.sha256,
+            'path': blob.path,
+            'thumbnail_path': blob.thumbnail_path,
+            'size': blob.size,
+            'width': blob.width,
+            'height': blob.height,
+            'created': blob.created
+        }
+    finally:
+        session.close()
+
+def get_recent_captures(limit=20):
+    """Get the most recent events that have a stored image"""
+    session = get_session()
+    try:
+        rows = (
+            session.query(FridgeEvent, EventImage.blob_sha256)
+            .join(EventImage, EventImage.event_id == FridgeEvent.id)
+            .order_by(FridgeEvent.timestamp.desc())
+            .limit(limit)
+            .all()
+        )
+        return [
+            {
+                'event_id': event.id,
+                'event_type': event.event_type,
+                'timestamp': event.timestamp,
+                'light_level': event.light_level,
+                'camera_id': event.camera_id,
+                'sha256': sha256
+            }
+            for event, sha256 in rows
+        ]
+    finally:
+        session.close()
+
+def save_brightness_batch(camera_id, samples, minutes, raw_cutoff, minute_cutoff):
+    """Bulk-insert a batch of raw and per-minute brightness rows and prune expired ones"""
+    session = get_session()
+    try:
+        session.bulk_insert_mappings(BrightnessSample, [
+            {'camera_id': camera_id, 'timestamp': timestamp, 'level': level}
+            for timestamp, level in samples
+        ])
+        session.bulk_insert_mappings(BrightnessMinute, [
+            dict(minute, camera_id=camera_id) for minute in minutes
+        ])
+        session.query(BrightnessSample).filter(
+            BrightnessSample.camera_id == camera_id, BrightnessSample.timestamp < raw_cutoff
+        ).delete(synchronize_session=False)
+        session.query(BrightnessMinute).filter(
+            BrightnessMinute.camera_id == camera_id, BrightnessMinute.timestamp < minute_cutoff
+        ).delete(synchronize_session=False)
+        session.commit()
+    except Exception as e:
+        logger.error(f"Failed to save brightness batch: {e}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def get_brightness(camera_id, start, end, raw=True):
+    """Get brightness between two unix timestamps, raw samples or per-minute aggregates"""
+    session = get_session()
+    try:
+        if raw:
+            rows = (
+                session.query(BrightnessSample)
+                .filter(BrightnessSample.camera_id == camera_id,
+                        BrightnessSample.timestamp >= start, BrightnessSample.timestamp < end)
+                .order_by(BrightnessSample.timestamp)
+                .all()
+            )
+            return [{'timestamp': row.timestamp, 'level': row.level} for row in rows]
+        rows = (
+            session.query(BrightnessMinute)
+            .filter(BrightnessMinute.camera_id == camera_id,
+                    BrightnessMinute.timestamp >= start, BrightnessMinute.timestamp < end)
+            .order_by(BrightnessMinute.timestamp)
+            .all()
+        )
+        return [
+            {'timestamp': row.timestamp, 'mean': row.mean, 'min': row.min, 'max': row.max, 'samples': row.samples}
+            for row in rows
+        ]
+    finally:
+        session.close()
+
+def get_door_usage(since, camera_id=None):
+    """Summarise door openings recorded since a datetime"""
+    session = get_session()
+    try:
+        query = session.query(
+            FridgeEvent.camera_id,
+            func.count(FridgeEvent.id),
+            func.sum(FridgeEvent.duration),
+            func.avg(FridgeEvent.duration),
+            func.max(FridgeEvent.duration)
+        ).filter(FridgeEvent.event_type == 'door_close', FridgeEvent.timestamp >= since)
+        if camera_id is not None:
+            query = query.filter(FridgeEvent.camera_id == camera_id)
+        return [
+            {
+                'camera_id': row_camera_id,
+                'openings': count,
+                'total_open_seconds': total or 0.0,
+                'average_open_seconds': average or 0.0,
+                'longest_open_seconds': longest or 0.0
             }
-            for item in session.query(FridgeItem).filter_by(is_present=True).all()
+            for row_camera_id, count, total, average, longest in query.group_by(FridgeEvent.camera_id).all()
         ]
     finally:
-        session.close() 
\ No newline at end of file
+        session.close()
+
+def get_or_create_analysis_run(version, model, prompt_sha256):
+    """Get the analysis run for a version label, creating it on first use; returns (id, created)"""
+    session = get_session()
+    try:
+        run = session.query(AnalysisRun).filter_by(version=version).first()
+        if run is not None:
+            if run.model != model or run.prompt_sha256 != prompt_sha256:
+                raise ValueError(f"Analysis version '{version}' was started with a different model or prompt")
+            return run.id, False
+        run = AnalysisRun(version=version, model=model, prompt_sha256=prompt_sha256)
+        session.add(run)
+        session.commit()
+        return run.id, True
+    except Exception as e:
+        logger.error(f"Failed to get analysis run: {e}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def finish_analysis_run(run_id):
+    session = get_session()
+    try:
+        session.query(AnalysisRun).filter_by(id=run_id).update({'finished': datetime.utcnow()})
+        session.commit()
+    except Exception as e:
+        logger.error(f"Failed to finish analysis run: {e}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def get_analysed_images(run_id):
+    """Image paths with successful results in an analysis run (failed ones are retried)"""
+    session = get_session()
+    try:
+        rows = (
+            session.query(ItemHistoryVersion.image_path)
+            .filter(ItemHistoryVersion.run_id == run_id, ItemHistoryVersion.error.is_(None))
+            .distinct()
+            .all()
+        )
+        return {image_path for (image_path,) in rows}
+    finally:
+        session.close()
+
+def get_event_images():
+    """All events with a stored image, oldest first, as (event_id, image_path, camera_id)"""
+    session = get_session()
+    try:
+        rows = (
+            session.query(FridgeEvent.id, FridgeEvent.image_path, FridgeEvent.camera_id)
+            .filter(FridgeEvent.image_path.isnot(None))
+            .order_by(FridgeEvent.timestamp)
+            .all()
+        )
+        return [(event_id, image_path, camera_id) for event_id, image_path, camera_id in rows]
+    finally:
+        session.close()
+
+def get_stored_image_paths():
+    """Paths of every blob in the image store, whether or not an event captured it directly"""
+    session = get_session()
+    try:
+        return [path for (path,) in session.query(ImageBlob.path).all()]
+    finally:
+        session.close()
+
+def save_analysis_results(run_id, results):
+    """Bulk-insert backfill results in one transaction
+
+    Each result is a dict with event_id, image_path, camera_id and either
+    'items' (a parsed detection) or 'error'.
+    """
+    session = get_session()
+    try:
+        rows = []
+        for result in results:
+            base = {
+                'run_id': run_id,
+                'event_id': result['event_id'],
+                'image_path': result['image_path'],
+                'camera_id': result['camera_id'] or DEFAULT_CAMERA_ID
+            }
+            if result.get('error') or not result.get('items'):
+                rows.append(dict(base, error=result.get('error')))
+                continue
+            for item in result['items']:
+                rows.append(dict(base, name=item['name'], quantity=item.get('quantity', 1),
+                                 confidence=item.get('confidence', 0.0)))
+        session.bulk_insert_mappings(ItemHistoryVersion, rows)
+        session.commit()
+    except Exception as e:
+        logger.error(f"Failed to save analysis results: {e}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
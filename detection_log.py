@@ -0,0 +1,242 @@
+"""Append-only JSON Lines log of detection results.
+
+Every detection is appended as one line to ``detections/detections.jsonl``.
+Alongside it a sidecar index holds one fixed-size ``(timestamp, offset)``
+entry per record, so a time range can be located with a binary search
+instead of a scan. When the active log grows past ``MAX_LOG_BYTES`` or its
+first record is older than ``MAX_LOG_AGE`` it is rotated into a gzip
+segment named after the time range it covers.
+"""
+import bisect
+import fcntl
+import glob
+import gzip
+import json
+import math
+import os
+import shutil
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+# Configuration
+LOG_DIR = "detections"
+LOG_NAME = "detections"
+MAX_LOG_BYTES = 10 * 1024 * 1024
+MAX_LOG_AGE = 24 * 60 * 60  # Seconds before the active log is rotated
+
+INDEX_ENTRY = struct.Struct('<dQ')  # (unix timestamp, byte offset)
+
+
+class _IndexView:
+    """Sequence over the timestamps of an index file, read on demand."""
+
+    def __init__(self, f):
+        self.f = f
+        f.seek(0, os.SEEK_END)
+        self.count = f.tell() // INDEX_ENTRY.size
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return self.entry(i)[0]
+
+    def entry(self, i):
+        self.f.seek(i * INDEX_ENTRY.size)
+        return INDEX_ENTRY.unpack(self.f.read(INDEX_ENTRY.size))
+
+
+def _index_lookup(index_path, start):
+    """Return the byte offset of the first record at or after ``start``."""
+    try:
+        with open(index_path, 'rb') as f:
+            view = _IndexView(f)
+            if start is None or len(view) == 0:
+                return 0
+            pos = bisect.bisect_left(view, start)
+            if pos == 0:
+                return 0
+            # Resume from the last indexed record before the range so that
+            # records missing from the index are still picked up by the scan
+            return view.entry(pos - 1)[1]
+    except FileNotFoundError:
+        return 0
+
+
+def write_snapshot(data, path):
+    """Atomically replace ``path`` with ``data`` serialised as JSON."""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    # Unique per thread as well as per process: detection workers share a process
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class DetectionLog:
+    def __init__(self, directory=LOG_DIR, max_bytes=MAX_LOG_BYTES, max_age=MAX_LOG_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.log_path = os.path.join(directory, f"{LOG_NAME}.jsonl")
+        self.index_path = os.path.join(directory, f"{LOG_NAME}.idx")
+        self.lock_path = os.path.join(directory, f".{LOG_NAME}.lock")
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def _locked(self):
+        # File lock so the monitor, CLI and control panel can share one log
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _first_timestamp(self):
+        try:
+            with open(self.index_path, 'rb') as f:
+                raw = f.read(INDEX_ENTRY.size)
+        except FileNotFoundError:
+            return None
+        if len(raw) < INDEX_ENTRY.size:
+            return None
+        return INDEX_ENTRY.unpack(raw)[0]
+
+    def _last_timestamp(self):
+        try:
+            with open(self.index_path, 'rb') as f:
+                view = _IndexView(f)
+                if len(view) == 0:
+                    return None
+                return view[len(view) - 1]
+        except FileNotFoundError:
+            return None
+
+    def _needs_rotation(self, now, incoming):
+        try:
+            size = os.path.getsize(self.log_path)
+        except FileNotFoundError:
+            return False
+        if size == 0:
+            return False
+        if size + incoming > self.max_bytes:
+            return True
+        first = self._first_timestamp()
+        return first is not None and now - first >= self.max_age
+
+    def _rotate(self):
+        """Move the active log aside; returns the uncompressed segment path."""
+        first = self._first_timestamp() or time.time()
+        last = self._last_timestamp() or first
+        # Round outwards so the name's millisecond range covers every record
+        base = os.path.join(self.directory,
+                            f"{LOG_NAME}-{math.floor(first * 1000)}-{math.ceil(last * 1000)}")
+        segment_path = base + '.jsonl'
+        os.replace(self.log_path, segment_path)
+        if os.path.exists(self.index_path):
+            os.replace(self.index_path, base + '.idx')
+        return segment_path
+
+    @staticmethod
+    def _compress(segment_path):
+        with open(segment_path, 'rb') as src, gzip.open(segment_path + '.gz.tmp', 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(segment_path + '.gz.tmp', segment_path + '.gz')
+        os.remove(segment_path)
+
+    def append(self, record):
+        """Append one record; returns the timestamp it was indexed under.
+
+        Timestamps are assigned under the lock and never go below the last
+        indexed one, so the index stays sorted for the binary search even
+        with concurrent writers or a wall clock stepping backwards.
+        """
+        rotated = None
+
+        with self._locked():
+            ts = record.get('ts', time.time())
+            last = self._last_timestamp()
+            if last is not None and ts < last:
+                ts = last
+            line = (json.dumps({**record, 'ts': ts}, separators=(',', ':')) + '\n').encode('utf-8')
+            if self._needs_rotation(ts, len(line)):
+                rotated = self._rotate()
+
+            fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                offset = os.fstat(fd).st_size
+                # A single write() on an O_APPEND descriptor lands as one unit
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+
+            with open(self.index_path, 'ab') as f:
+                f.write(INDEX_ENTRY.pack(ts, offset))
+
+        # Compress outside the lock so writers are not held up by gzip
+        if rotated:
+            try:
+                self._compress(rotated)
+            except Exception as e:
+                print(f"Failed to compress detection log segment {rotated}: {str(e)}")
+        return ts
+
+    def _segments(self):
+        """Yield (first, last, data_path, index_path) for rotated segments, oldest first."""
+        segments = []
+        pattern = os.path.join(self.directory, f"{LOG_NAME}-*-*.jsonl*")
+        for path in glob.glob(pattern):
+            if path.endswith('.tmp'):
+                continue
+            if path.endswith('.jsonl') and os.path.exists(path + '.gz'):
+                continue  # Compressed copy exists; the original is about to be removed
+            name = os.path.basename(path).split('.', 1)[0]
+            try:
+                _, first, last = name.split('-')
+            except ValueError:
+                continue
+            index_path = os.path.join(self.directory, name + '.idx')
+            segments.append((int(first) / 1000, int(last) / 1000, path, index_path))
+        segments.sort()
+        return segments
+
+    @staticmethod
+    def _scan(data_path, index_path, start, end):
+        offset = _index_lookup(index_path, start)
+        opener = gzip.open if data_path.endswith('.gz') else open
+        try:
+            with opener(data_path, 'rb') as f:
+                # Seeking a gzip stream decompresses up to the offset
+                f.seek(offset)
+                for raw in f:
+                    try:
+                        record = json.loads(raw)
+                    except ValueError:
+                        continue  # Partially written trailing line
+                    ts = record.get('ts', 0)
+                    if start is not None and ts < start:
+                        continue
+                    if end is not None and ts >= end:
+                        break
+                    yield record
+        except FileNotFoundError:
+            return
+
+    def read_range(self, start=None, end=None):
+        """Yield records with ``start <= ts < end`` (unix seconds), oldest first."""
+        for first, last, data_path, index_path in self._segments():
+            if (start is not None and last < start) or (end is not None and first >= end):
+                continue
+            yield from self._scan(data_path, index_path, start, end)
+        yield from self._scan(self.log_path, self.index_path, start, end)
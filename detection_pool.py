@@ -0,0 +1,89 @@
+"""Shared, rate-limited pool of OpenAI detection workers.
+
+Every pipeline that calls the vision API (single-camera monitor, multi-camera
+supervisor, backfill) goes through a ``DetectionPool`` so that concurrency and
+request rate are bounded in one place regardless of how many cameras are
+capturing. The rate limit is shared between processes through a small state
+file, so a backfill running next to the live monitor draws from the same budget.
+Every pool uses ``API_REQUESTS_PER_MINUTE``: per-process rates would each add
+their own spacing to the shared slot and together exceed the limit.
+"""
+import fcntl
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from capture_identify import encode_image, ask_openai_for_objects, parse_response_to_json
+
+# Configuration
+API_WORKERS = 2
+API_REQUESTS_PER_MINUTE = 20
+RATE_LIMIT_FILE = os.path.join("run", "api_rate_limit")
+CLOCK_TOLERANCE = 1.0  # Seconds the wall and monotonic clocks may drift apart between calls
+
+# (next free slot, wall time, monotonic time) - slots are in monotonic seconds
+_STATE = struct.Struct('<ddd')
+
+
+class RateLimiter:
+    """Spaces calls at least ``60 / per_minute`` seconds apart across threads and processes"""
+
+    def __init__(self, per_minute=API_REQUESTS_PER_MINUTE, state_file=RATE_LIMIT_FILE):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.state_file = state_file
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(state_file) or '.', exist_ok=True)
+
+    def _reserve_slot(self, now):
+        # The next free slot lives in the state file in monotonic seconds, which
+        # are shared by all processes on the host and unaffected by clock steps
+        wall = time.time()
+        fd = os.open(self.state_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            raw = os.pread(fd, _STATE.size, 0)
+            next_slot = now
+            if len(raw) == _STATE.size:
+                stored_slot, stored_wall, stored_now = _STATE.unpack(raw)
+                # Both clocks advance together unless the host rebooted (the
+                # monotonic clock restarted) or suspended; then the slot is stale
+                if abs((wall - stored_wall) - (now - stored_now)) <= CLOCK_TOLERANCE:
+                    next_slot = stored_slot
+            slot = max(now, next_slot)
+            os.pwrite(fd, _STATE.pack(slot + self.interval, wall, now), 0)
+            return slot
+        finally:
+            os.close(fd)
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = self._reserve_slot(now)
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class DetectionPool:
+    def __init__(self, client, workers=API_WORKERS):
+        self.client = client
+        self.limiter = RateLimiter()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='detect')
+
+    def detect(self, image_path):
+        """Run detection on one image in the calling thread, honouring the rate limit"""
+        base64_image = encode_image(image_path)
+        self.limiter.acquire()
+        response_str = ask_openai_for_objects(base64_image, client=self.client)
+        return parse_response_to_json(response_str)
+
+    def submit(self, fn, *args, **kwargs):
+        """Run ``fn`` on a pool worker; ``fn`` should call ``detect`` for API access"""
+        return self.executor.submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,94 @@
+"""Pre-event frame ring buffer and door-open clip recording.
+
+``FrameRingBuffer`` keeps the last few seconds of downscaled frames in one
+preallocated array; ``push`` resizes straight into the next slot, so the
+capture loop runs at constant memory without allocating per frame. When the
+door opens, ``ClipRecorder`` writes the buffered pre-event frames followed by
+every frame of the open period to a compact MJPG clip, and tracks the frames
+that changed most as key frames for detection.
+"""
+import os
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+# Configuration
+CLIP_DIR = "clips"
+CLIP_WIDTH = 320
+CLIP_HEIGHT = 240
+CLIP_PRE_SECONDS = 5       # Seconds of history kept before the door opens
+CLIP_MAX_SECONDS = 120     # Longest open period recorded into one clip
+CLIP_KEY_FRAMES = 3
+
+
+class FrameRingBuffer:
+    def __init__(self, capacity, width=CLIP_WIDTH, height=CLIP_HEIGHT):
+        self.capacity = capacity
+        self.size = (width, height)
+        self.frames = np.zeros((capacity, height, width, 3), dtype=np.uint8)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.head = 0  # Next slot to write
+        self.count = 0
+
+    def push(self, frame, timestamp):
+        """Downscale frame into the next slot; returns that slot (a view, not a copy)"""
+        slot = self.frames[self.head]
+        cv2.resize(frame, self.size, dst=slot, interpolation=cv2.INTER_AREA)
+        self.timestamps[self.head] = timestamp
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        return slot
+
+    def since(self, timestamp):
+        """Yield (timestamp, frame) pairs newer than ``timestamp``, oldest first"""
+        start = (self.head - self.count) % self.capacity
+        for i in range(self.count):
+            index = (start + i) % self.capacity
+            if self.timestamps[index] >= timestamp:
+                yield self.timestamps[index], self.frames[index]
+
+
+class ClipRecorder:
+    """Writes one door-open clip and keeps its highest-motion key frames"""
+
+    def __init__(self, fps, camera_id, num_key_frames=CLIP_KEY_FRAMES,
+                 width=CLIP_WIDTH, height=CLIP_HEIGHT, clip_dir=CLIP_DIR):
+        os.makedirs(clip_dir, exist_ok=True)
+        timestamp = datetime.now().strftime('%y%m%d%H%M%S%f')
+        self.path = os.path.join(clip_dir, f"{camera_id}-{timestamp}.avi")
+        self.writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+        if not self.writer.isOpened():
+            raise RuntimeError(f"Could not open clip writer for {self.path}")
+        self.frame_count = 0
+        self.started_at = None
+        self.previous = np.zeros((height, width, 3), dtype=np.uint8)
+        self.diff = np.zeros((height, width, 3), dtype=np.uint8)
+        self.key_frames = np.zeros((num_key_frames, height, width, 3), dtype=np.uint8)
+        self.key_scores = np.full(num_key_frames, -1.0)
+
+    def add(self, frame, timestamp):
+        """Append a downscaled frame (as returned by FrameRingBuffer.push)"""
+        if self.started_at is None:
+            self.started_at = timestamp
+        self.writer.write(frame)
+
+        # Motion score against the previous frame, computed in preallocated buffers
+        if self.frame_count and len(self.key_scores):
+            cv2.absdiff(frame, self.previous, dst=self.diff)
+            score = sum(cv2.mean(self.diff)[:3])
+            weakest = int(np.argmin(self.key_scores))
+            if score > self.key_scores[weakest]:
+                np.copyto(self.key_frames[weakest], frame)
+                self.key_scores[weakest] = score
+        np.copyto(self.previous, frame)
+        self.frame_count += 1
+
+    def best_key_frames(self):
+        """Key frames ordered by descending motion score"""
+        order = np.argsort(-self.key_scores)
+        return [self.key_frames[i] for i in order if self.key_scores[i] >= 0]
+
+    def finish(self):
+        self.writer.release()
+        return self.path
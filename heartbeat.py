@@ -0,0 +1,46 @@
+"""Liveness heartbeat for processes started by the control panel supervisor.
+
+The supervisor passes a file path in ``FRIDGE_HEARTBEAT_FILE``; ``beat()``
+touches it at most once per ``MIN_BEAT_INTERVAL`` so it is cheap to call from
+hot loops. Outside the supervisor the variable is unset and ``beat()`` is a no-op.
+A process that starts its own workers (``multi_monitor``) points each worker at
+a separate file with ``set_heartbeat_file`` and watches them itself.
+"""
+import os
+import time
+
+HEARTBEAT_ENV = "FRIDGE_HEARTBEAT_FILE"
+MIN_BEAT_INTERVAL = 1.0
+
+_last_beat = 0.0
+
+
+def beat():
+    global _last_beat
+    path = os.environ.get(HEARTBEAT_ENV)
+    if not path:
+        return
+    now = time.monotonic()
+    if now - _last_beat < MIN_BEAT_INTERVAL:
+        return
+    _last_beat = now
+    try:
+        with open(path, 'a'):
+            os.utime(path, None)
+    except OSError:
+        pass
+
+
+def set_heartbeat_file(path):
+    """Beat to ``path`` from now on instead of the file inherited from the parent"""
+    global _last_beat
+    os.environ[HEARTBEAT_ENV] = path
+    _last_beat = 0.0
+
+
+def heartbeat_age(path):
+    """Seconds since ``path`` was last touched, or None if it has never been"""
+    try:
+        return time.time() - os.path.getmtime(path)
+    except OSError:
+        return None
@@ -0,0 +1,139 @@
+"""Content-addressed storage for captured frames.
+
+Frames are JPEG-encoded and stored under the SHA-256 of the encoded bytes,
+sharded two levels deep (``imgs/objects/ab/cd/abcd....jpg``), so repeated
+identical captures are written once and same-second captures never collide.
+Thumbnails are produced off the capture path by a background worker.
+"""
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+from database.operations import record_image_blob, set_blob_thumbnail, link_event_image
+
+# Configuration
+STORE_DIR = "imgs"
+JPEG_QUALITY = 90
+THUMBNAIL_WIDTH = 160
+THUMBNAIL_QUALITY = 70
+
+logger = logging.getLogger(__name__)
+
+
+def _shard_path(root, sha256, suffix='.jpg'):
+    return os.path.join(root, sha256[:2], sha256[2:4], sha256 + suffix)
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class ImageStore:
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.thumbs_dir = os.path.join(root, 'thumbs')
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def blob_path(self, sha256):
+        return _shard_path(self.objects_dir, sha256)
+
+    def thumbnail_path(self, sha256):
+        return _shard_path(self.thumbs_dir, sha256)
+
+    def put_frame(self, frame):
+        """Store a BGR frame; returns (sha256, path) of the stored blob"""
+        ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        if not ok:
+            raise RuntimeError("JPEG encoding failed")
+        height, width = frame.shape[:2]
+        return self.put_bytes(jpeg.tobytes(), width, height)
+
+    def put_bytes(self, data, width, height):
+        """Store already-encoded JPEG bytes; returns (sha256, path)"""
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(sha256)
+
+        if not os.path.exists(path):
+            _write_atomic(path, data)
+
+        created, needs_thumbnail = record_image_blob(sha256, path, len(data), width, height)
+        if not created:
+            logger.debug(f"Duplicate frame {sha256[:12]}, reusing stored blob")
+        if needs_thumbnail:
+            # Also retried for known blobs whose thumbnail was lost or failed
+            self._enqueue_thumbnail(sha256)
+        return sha256, path
+
+    def link(self, event_id, sha256):
+        """Record that a fridge event captured the given blob"""
+        link_event_image(event_id, sha256)
+
+    def _enqueue_thumbnail(self, sha256):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._thumbnail_worker, daemon=True)
+                self._worker.start()
+        self._queue.put(sha256)
+
+    def _thumbnail_worker(self):
+        while True:
+            sha256 = self._queue.get()
+            try:
+                self.make_thumbnail(sha256)
+            except Exception as e:
+                logger.error(f"Thumbnail generation failed for {sha256[:12]}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def make_thumbnail(self, sha256):
+        thumb_path = self.thumbnail_path(sha256)
+        if not os.path.exists(thumb_path):
+            # Let libjpeg decode at 1/4 scale rather than decoding the full frame
+            image = cv2.imread(self.blob_path(sha256), cv2.IMREAD_REDUCED_COLOR_4)
+            if image is None:
+                raise RuntimeError("Could not decode stored image")
+            height, width = image.shape[:2]
+            if width > THUMBNAIL_WIDTH:
+                size = (THUMBNAIL_WIDTH, max(1, height * THUMBNAIL_WIDTH // width))
+                image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+            ok, jpeg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, THUMBNAIL_QUALITY])
+            if not ok:
+                raise RuntimeError("Thumbnail encoding failed")
+            _write_atomic(thumb_path, jpeg.tobytes())
+        set_blob_thumbnail(sha256, thumb_path)
+        return thumb_path
+
+    def wait(self, timeout=None):
+        """Block until all queued thumbnails have been written; returns False on timeout"""
+        if timeout is None:
+            self._queue.join()
+            return True
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+
+_store = None
+
+def get_image_store():
+    global _store
+    if _store is None:
+        _store = ImageStore()
+    return _store
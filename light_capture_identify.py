@@ -1,12 +1,18 @@
 import cv2
 import numpy as np
 import time
-from datetime import datetime
 import os
 import logging
-from capture_identify import encode_image, ask_openai_for_objects, parse_response_to_json, update_json_file
-from openai import OpenAI
-from database.operations import record_fridge_event, update_items
+import signal
+from capture_identify import update_json_file
+from database.operations import record_fridge_event, update_items, set_event_clip
+from image_store import get_image_store
+from camera_config import DEFAULT_CAMERA_ID
+from detection_pool import DetectionPool
+from heartbeat import beat
+import profiler
+from brightness_series import BrightnessSeries
+from frame_buffer import FrameRingBuffer, ClipRecorder, CLIP_PRE_SECONDS, CLIP_MAX_SECONDS
 
 # Configuration
 CAMERA_INDEX = 0
@@ -15,15 +21,19 @@ STABILIZATION_TIME = 2
 MIN_CAPTURE_INTERVAL = 300
 FRAME_SAMPLE_RATE = 0.5
 LIGHT_LOG_INTERVAL = 30  # Seconds between light level logs
+DETECT_CLIP_KEY_FRAMES = False  # Also run detection on the best key frame of each door-open clip
+THUMBNAIL_WAIT = 5  # Seconds to let queued thumbnails finish on shutdown
+
+logger = logging.getLogger('fridge_monitor')
 
 # Set up logging
 def setup_logging():
     log_dir = 'logs'
     os.makedirs(log_dir, exist_ok=True)
-    
+
     logging.basicConfig(
         level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
+        format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s',
         handlers=[
             logging.FileHandler(f'{log_dir}/fridge_monitor.log'),
             logging.StreamHandler()
@@ -31,58 +41,60 @@ def setup_logging():
     )
     return logging.getLogger('fridge_monitor')
 
-def is_well_lit(frame):
+def handle_sigterm(signum, frame):
+    # Turn the control panel's SIGTERM into the same clean shutdown as Ctrl-C,
+    # so run_monitor flushes buffered brightness samples and closes any clip
+    raise KeyboardInterrupt
+
+def frame_brightness(frame):
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    avg_brightness = np.mean(gray)
-    logger.debug(f"Current brightness: {avg_brightness:.2f}")
-    return avg_brightness > LIGHT_THRESHOLD
+    return float(np.mean(gray))
 
-def setup_camera():
-    logger.info("Initializing camera...")
-    cap = cv2.VideoCapture(CAMERA_INDEX)
+def setup_camera(camera_index=CAMERA_INDEX):
+    logger.info(f"Initializing camera {camera_index}...")
+    cap = cv2.VideoCapture(camera_index)
     cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, 1)
     cap.set(cv2.CAP_PROP_AUTOFOCUS, 1)
-    
+
     if not cap.isOpened():
         logger.error("Failed to initialize camera")
         raise RuntimeError("Camera initialization failed")
-    
+
     logger.info("Camera initialized successfully")
     return cap
 
-def capture_and_process(cap, client):
-    """Capture and process a single frame"""
-    timestamp = datetime.now().strftime('%y%m%d%H%M%S')
-    output_path = os.path.join('imgs', f"{timestamp}.jpg")
-    os.makedirs('imgs', exist_ok=True)
-    
-    logger.info(f"Capturing image: {output_path}")
-    
+def capture_frame(cap, camera_id=DEFAULT_CAMERA_ID):
+    """Capture and store a single frame; returns (event_id, image_path)"""
+    logger.info(f"Capturing image for camera {camera_id}")
+
     ret, frame = cap.read()
     if not ret:
         logger.error("Frame capture failed")
         raise RuntimeError("Failed to capture frame")
-    
+
     # Get light level
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    light_level = np.mean(gray)
-    
-    cv2.imwrite(output_path, frame)
-    logger.info("Image saved successfully")
-    
+    light_level = float(np.mean(gray))
+
+    store = get_image_store()
+    sha256, output_path = store.put_frame(frame)
+    logger.info(f"Image saved successfully: {output_path}")
+
+    event_id = record_fridge_event('item_detected', output_path, light_level, camera_id=camera_id)
+    store.link(event_id, sha256)
+    return event_id, output_path
+
+def process_capture(pool, event_id, image_path, camera_id=DEFAULT_CAMERA_ID):
+    """Run detection on a stored capture and update the inventory"""
     try:
-        # Record the event first
-        event_id = record_fridge_event('item_detected', output_path, light_level)
-        
-        logger.info("Starting OpenAI processing")
-        base64_image = encode_image(output_path)
-        response_str = ask_openai_for_objects(base64_image, client=client)
-        parsed_data = parse_response_to_json(response_str)
-        
+        logger.info(f"Starting OpenAI processing for camera {camera_id}")
+        parsed_data = pool.detect(image_path)
+
         # Update database with detected items
-        update_items(parsed_data.get('items', []), event_id)
-        
-        parsed_data['image_path'] = output_path
+        update_items(parsed_data.get('items', []), event_id, camera_id=camera_id)
+
+        parsed_data['image_path'] = image_path
+        parsed_data['camera_id'] = camera_id
         update_json_file(parsed_data)
         logger.info("OpenAI processing completed successfully")
         return parsed_data
@@ -90,81 +102,181 @@ def capture_and_process(cap, client):
         logger.error(f"OpenAI processing failed: {str(e)}", exc_info=True)
         raise
 
-def main():
-    global logger
-    logger = setup_logging()
-    logger.info("=== Starting Fridge Monitor ===")
-    
+def start_clip(ring, camera_id, now):
+    """Open a clip and seed it with the buffered frames from before the door opened"""
+    clip = ClipRecorder(1 / FRAME_SAMPLE_RATE, camera_id)
+    for timestamp, frame in ring.since(now - CLIP_PRE_SECONDS):
+        clip.add(frame, timestamp)
+    return clip
+
+def finish_clip(clip, event_id, camera_id, capture_event_ids, on_capture):
+    """Close a clip, attach it to the door_open event and store its key frames"""
+    clip_path = clip.finish()
+    if event_id is None:
+        event_id = record_fridge_event('door_open', camera_id=camera_id, clip_path=clip_path)
+    else:
+        set_event_clip(event_id, clip_path)
+    for capture_event_id in capture_event_ids:
+        set_event_clip(capture_event_id, clip_path)
+
+    store = get_image_store()
+    key_frame_paths = []
+    for key_frame in clip.best_key_frames():
+        sha256, path = store.put_frame(key_frame)
+        store.link(event_id, sha256)
+        key_frame_paths.append(path)
+    logger.info(f"Saved door-open clip {clip_path} ({clip.frame_count} frames, "
+                f"{len(key_frame_paths)} key frames)")
+
+    if DETECT_CLIP_KEY_FRAMES and key_frame_paths:
+        on_capture(event_id, key_frame_paths[0])
+
+def run_monitor(on_capture, camera_index=CAMERA_INDEX, camera_id=DEFAULT_CAMERA_ID):
+    """Watch one camera for the fridge light and call on_capture(event_id, image_path) per capture"""
+    cap = setup_camera(camera_index)
+    # Constant-memory history of downscaled frames for pre-event clip footage
+    ring = FrameRingBuffer(int(CLIP_PRE_SECONDS / FRAME_SAMPLE_RATE) + 1)
+    # Every sample is kept in memory and persisted in batches; door events come from it
+    series = BrightnessSeries(LIGHT_THRESHOLD, camera_id)
+    clip = None
     try:
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            logger.error("OPENAI_API_KEY not found in environment")
-            raise ValueError("OPENAI_API_KEY environment variable not set")
-        
-        client = OpenAI(api_key=api_key)
-        logger.info("OpenAI client initialized")
-        
-        cap = setup_camera()
         last_capture_time = 0
-        last_light_state = False
-        
+        door_event_id = None
+        capture_due_at = None
+        clip_event_ids = []
+
         last_light_log = 0  # Track last light level log time
         frame_count = 0
-        
-        logger.info("Beginning light monitoring loop")
-        
+
+        logger.info(f"Beginning light monitoring loop for camera {camera_id}")
+
         while True:
+            beat()
             frame_count += 1
             ret, frame = cap.read()
             if not ret:
                 logger.warning("Failed to grab frame, retrying...")
                 time.sleep(1)
                 continue
-            
-            current_light_state = is_well_lit(frame)
+
             current_time = time.time()
-            
+            avg_brightness = frame_brightness(frame)
+            transition = series.append(current_time, avg_brightness)
+            current_light_state = series.door_open
+
+            small_frame = ring.push(frame, current_time)
+            if clip is not None:
+                clip.add(small_frame, current_time)
+
             # Periodic light level logging
             if current_time - last_light_log >= LIGHT_LOG_INTERVAL:
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                avg_brightness = np.mean(gray)
                 logger.info(f"Current light level: {avg_brightness:.2f} (threshold: {LIGHT_THRESHOLD})")
                 last_light_log = current_time
-            
+
             # Log every 100 frames to avoid spam
             if frame_count % 100 == 0:
                 logger.debug(f"Monitor running: Frame {frame_count}, Light: {current_light_state}")
-            
-            if (current_light_state and not last_light_state and 
-                current_time - last_capture_time > MIN_CAPTURE_INTERVAL):
-                
-                logger.info("Light change detected, waiting for stabilization...")
-                time.sleep(STABILIZATION_TIME)
-                
-                ret, frame = cap.read()
-                if ret and is_well_lit(frame):
+
+            if transition == 'open':
+                door_event_id = None
+                try:
+                    door_event_id = record_fridge_event('door_open', light_level=avg_brightness,
+                                                        camera_id=camera_id)
+                except Exception as e:
+                    logger.error(f"Failed to record door open: {str(e)}")
+                try:
+                    clip = start_clip(ring, camera_id, current_time)
+                except Exception as e:
+                    logger.error(f"Could not start door-open clip: {str(e)}")
+
+                if current_time - last_capture_time > MIN_CAPTURE_INTERVAL:
+                    # Keep sampling (and recording the clip) while the light settles
+                    logger.info("Light change detected, waiting for stabilization...")
+                    capture_due_at = current_time + STABILIZATION_TIME
+
+            if capture_due_at is not None and current_time >= capture_due_at:
+                capture_due_at = None
+                if current_light_state:
                     logger.info("Light stable, initiating capture sequence")
                     try:
-                        result = capture_and_process(cap, client)
-                        logger.info(f"Detection completed: {len(result.get('items', [])) if result else 0} items found")
+                        event_id, image_path = capture_frame(cap, camera_id)
+                        clip_event_ids.append(event_id)
+                        on_capture(event_id, image_path)
                         last_capture_time = current_time
                     except Exception as e:
                         logger.error(f"Capture sequence failed: {str(e)}", exc_info=True)
                 else:
                     logger.warning("Light unstable after stabilization period, skipping capture")
-            
-            last_light_state = current_light_state
+
+            if transition == 'close':
+                duration = series.open_duration(current_time)
+                logger.info(f"Door closed after {duration:.1f}s")
+                try:
+                    record_fridge_event('door_close', light_level=avg_brightness, camera_id=camera_id,
+                                        duration=duration)
+                except Exception as e:
+                    logger.error(f"Failed to record door close: {str(e)}")
+
+            if clip is not None and (not current_light_state or
+                                     series.open_duration(current_time) >= CLIP_MAX_SECONDS):
+                try:
+                    finish_clip(clip, door_event_id, camera_id, clip_event_ids, on_capture)
+                except Exception as e:
+                    logger.error(f"Failed to save door-open clip: {str(e)}", exc_info=True)
+                clip = None
+                clip_event_ids = []
+
             time.sleep(FRAME_SAMPLE_RATE)
-            
+    finally:
+        if clip is not None:
+            clip.finish()
+        series.flush(close_minute=True)
+        cap.release()
+        # Anything still queued is regenerated on demand by the control panel
+        if not get_image_store().wait(timeout=THUMBNAIL_WAIT):
+            logger.warning("Stopped with thumbnails still queued")
+
+def main():
+    from openai import OpenAI
+
+    global logger
+    logger = setup_logging()
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    profiler.install()
+    logger.info("=== Starting Fridge Monitor ===")
+
+    try:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            logger.error("OPENAI_API_KEY not found in environment")
+            raise ValueError("OPENAI_API_KEY environment variable not set")
+
+        client = OpenAI(api_key=api_key)
+        pool = DetectionPool(client)
+        logger.info("OpenAI client initialized")
+
+        def handle(event_id, image_path):
+            try:
+                result = process_capture(pool, event_id, image_path)
+                logger.info(f"Detection completed: {len(result.get('items', []))} items found")
+            except Exception:
+                pass  # Already logged by process_capture
+
+        def on_capture(event_id, image_path):
+            # Detect on a pool worker so the loop keeps sampling and recording the clip
+            pool.submit(handle, event_id, image_path)
+
+        try:
+            run_monitor(on_capture)
+        finally:
+            pool.shutdown(wait=False)
+
     except KeyboardInterrupt:
         logger.info("Received shutdown signal")
     except Exception as e:
         logger.critical(f"Unexpected error: {str(e)}", exc_info=True)
     finally:
-        if 'cap' in locals():
-            cap.release()
         logger.info("=== Fridge Monitor Stopped ===")
 
 if __name__ == "__main__":
     main()
-
@@ -1,6 +1,9 @@
 import cv2
-from flask import Flask, Response, render_template_string
+from flask import Flask, Response, render_template_string, abort
 import threading
+from camera_config import load_cameras
+from heartbeat import beat
+import profiler
 
 app = Flask(__name__)
 
@@ -19,18 +22,21 @@ HTML_PAGE = """
 </head>
 <body>
     <h1>Fridge Camera Live Feed</h1>
-    <img src="{{ url_for('video_feed') }}" width="640" height="480">
+    {% for camera in cameras %}
+    <h2>{{ camera.name }}</h2>
+    <img src="{{ url_for('camera_feed', camera_id=camera.id) }}" width="640" height="480">
+    {% endfor %}
 </body>
 </html>
 """
 
 class VideoCamera:
-    def __init__(self):
+    def __init__(self, camera_index=0):
         # Initialize the video camera
-        self.video = cv2.VideoCapture(0)  # 0 is the default camera
+        self.video = cv2.VideoCapture(camera_index)
 
         if not self.video.isOpened():
-            raise RuntimeError("Could not start camera.")
+            raise RuntimeError(f"Could not start camera {camera_index}.")
 
         # Lock for thread-safe frame access
         self.lock = threading.Lock()
@@ -52,6 +58,7 @@ class VideoCamera:
             if not ret:
                 continue
 
+            beat()
             with self.lock:
                 self.frame = jpeg.tobytes()
 
@@ -63,10 +70,28 @@ class VideoCamera:
         if self.video.isOpened():
             self.video.release()
 
-# Initialize the camera
-camera = VideoCamera()
-
-def generate_frames():
+# Cameras are opened on first use rather than at import
+camera_configs = load_cameras()
+camera_indexes = {config['id']: config['index'] for config in camera_configs}
+default_camera_id = camera_configs[0]['id']
+cameras = {}
+cameras_lock = threading.Lock()
+
+def get_camera(camera_id):
+    with cameras_lock:
+        if camera_id not in cameras:
+            cameras[camera_id] = VideoCamera(camera_indexes[camera_id])
+        return cameras[camera_id]
+
+def open_cameras():
+    """Warm up every configured camera in the background so the server can start immediately"""
+    for camera_id in camera_indexes:
+        try:
+            get_camera(camera_id)
+        except RuntimeError as e:
+            print(f"Camera {camera_id} failed to start: {str(e)}")
+
+def generate_frames(camera):
     while True:
         frame = camera.get_frame()
         if frame is None:
@@ -79,15 +104,28 @@ def generate_frames():
 @app.route('/')
 def index():
     # Render the HTML page
-    return render_template_string(HTML_PAGE)
+    return render_template_string(HTML_PAGE, cameras=camera_configs)
 
 @app.route('/video_feed')
 def video_feed():
+    return camera_feed(default_camera_id)
+
+@app.route('/video_feed/<camera_id>')
+def camera_feed(camera_id):
+    if camera_id not in camera_indexes:
+        abort(404)
+    try:
+        camera = get_camera(camera_id)
+    except RuntimeError as e:
+        return Response(str(e), status=503)
     # Return the response generated along with the specific media type (mime type)
-    return Response(generate_frames(),
+    return Response(generate_frames(camera),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
 if __name__ == '__main__':
+    profiler.install()
+    threading.Thread(target=open_cameras, daemon=True).start()
+    
     # Run the Flask app on all available IPs on port 5000
     app.run(host='0.0.0.0', port=5000, threaded=True)
 
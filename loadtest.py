@@ -0,0 +1,287 @@
+"""Local load generator for the live feed and control panel.
+
+Opens ``--streams`` concurrent ``/video_feed`` connections and runs
+``--pollers`` clients hitting ``/inventory`` and ``/status``, then reports
+delivered frames per second, frame-gap and request latency percentiles, and
+CPU / RSS of the server processes. Only loopback URLs are accepted.
+
+The feed re-sends its cached JPEG until the camera produces a new one, so a
+frame counts as delivered only when its bytes differ from the previous part;
+the raw multipart part rate is reported separately.
+
+Usage:
+    python3 loadtest.py --streams 4 --pollers 2 --duration 30
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+DEFAULT_FEED_URL = "http://127.0.0.1:5000"
+DEFAULT_PANEL_URL = "http://127.0.0.1:8000"
+POLL_ENDPOINTS = ['/inventory', '/status']
+LOCAL_HOSTS = ('127.0.0.1', 'localhost', '::1')
+BOUNDARY = b'--frame\r\n'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Load-test the fridge-sight web services on localhost')
+    parser.add_argument('--feed_url', default=DEFAULT_FEED_URL, help='live_feed base URL')
+    parser.add_argument('--panel_url', default=DEFAULT_PANEL_URL, help='control_panel base URL')
+    parser.add_argument('--camera_id', default=None, help='Stream /video_feed/<camera_id> instead of the default feed')
+    parser.add_argument('--streams', type=int, default=4, help='Concurrent /video_feed viewers')
+    parser.add_argument('--pollers', type=int, default=2, help='Concurrent /inventory and /status pollers')
+    parser.add_argument('--poll_interval', type=float, default=0.5, help='Seconds between polls per poller')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run')
+    parser.add_argument('--pid', type=int, action='append', default=[],
+                        help='Extra server PID to sample (service PIDs are read from /health)')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    return parser.parse_args()
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarise(values, scale=1000.0):
+    """p50/p95/p99/max of a list of seconds, in milliseconds"""
+    if not values:
+        return None
+    stats = {f"p{pct}": round(percentile(values, pct) * scale, 2) for pct in (50, 95, 99)}
+    stats['max'] = round(max(values) * scale, 2)
+    return stats
+
+
+def require_local(url):
+    host = urllib.parse.urlparse(url).hostname
+    if host not in LOCAL_HOSTS:
+        raise ValueError(f"Refusing to load-test non-local host {host}")
+
+
+class StreamClient(threading.Thread):
+    """Reads an MJPEG stream and records when each part, and each distinct frame, arrives"""
+
+    def __init__(self, url, stop):
+        super().__init__(daemon=True)
+        self.url = url
+        self.stop = stop
+        self.part_times = []
+        self.frame_times = []
+        self.last_digest = None
+        self.bytes = 0
+        self.error = None
+        self.connect_time = None
+
+    def _part(self, part, now):
+        _, _, payload = part.partition(b'\r\n\r\n')
+        digest = hashlib.sha1(payload).digest()
+        self.part_times.append(now)
+        if digest != self.last_digest:
+            self.frame_times.append(now)
+            self.last_digest = digest
+
+    def run(self):
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(self.url, timeout=10) as response:
+                self.connect_time = time.perf_counter() - started
+                buffer = b''
+                while not self.stop.is_set():
+                    chunk = response.read1(65536)
+                    if not chunk:
+                        break
+                    self.bytes += len(chunk)
+                    now = time.perf_counter()
+                    # A part is complete once the next boundary arrives; the
+                    # remainder (possibly a split boundary) waits for more data
+                    parts = (buffer + chunk).split(BOUNDARY)
+                    buffer = parts.pop()
+                    for part in parts:
+                        if part:
+                            self._part(part, now)
+        except Exception as e:
+            self.error = str(e)
+
+
+class Poller(threading.Thread):
+    def __init__(self, base_url, interval, stop):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.interval = interval
+        self.stop = stop
+        self.latencies = {endpoint: [] for endpoint in POLL_ENDPOINTS}
+        self.errors = 0
+
+    def run(self):
+        while not self.stop.is_set():
+            for endpoint in POLL_ENDPOINTS:
+                started = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(self.base_url + endpoint, timeout=10) as response:
+                        response.read()
+                    self.latencies[endpoint].append(time.perf_counter() - started)
+                except Exception:
+                    self.errors += 1
+            self.stop.wait(self.interval)
+
+
+class CpuSampler(threading.Thread):
+    """Samples CPU and RSS of the server processes (and their children) once a second"""
+
+    def __init__(self, pids, stop):
+        super().__init__(daemon=True)
+        self.pids = pids
+        self.stop = stop
+        self.cpu = []
+        self.rss = []
+
+    def run(self):
+        import psutil
+
+        procs = []
+        for pid in self.pids:
+            try:
+                proc = psutil.Process(pid)
+                procs += [proc] + proc.children(recursive=True)
+            except psutil.Error:
+                continue
+        for proc in procs:
+            try:
+                proc.cpu_percent(None)
+            except psutil.Error:
+                pass
+        while not self.stop.wait(1.0):
+            cpu, rss = 0.0, 0
+            for proc in procs:
+                try:
+                    cpu += proc.cpu_percent(None)
+                    rss += proc.memory_info().rss
+                except psutil.Error:
+                    continue
+            self.cpu.append(cpu)
+            self.rss.append(rss)
+
+
+def listening_pid(url):
+    """PID of the local process listening on the URL's port, if it can be determined"""
+    import psutil
+
+    port = urllib.parse.urlparse(url).port
+    try:
+        for conn in psutil.net_connections(kind='tcp'):
+            if conn.status == psutil.CONN_LISTEN and conn.laddr and conn.laddr.port == port and conn.pid:
+                return conn.pid
+    except psutil.Error:
+        pass
+    return None
+
+
+def server_pids(panel_url):
+    """The control panel itself plus every running service it supervises"""
+    pids = []
+    panel_pid = listening_pid(panel_url)
+    if panel_pid:
+        pids.append(panel_pid)
+    try:
+        with urllib.request.urlopen(panel_url + '/health', timeout=5) as response:
+            health = json.load(response)
+    except Exception:
+        return pids
+    return pids + [status['pid'] for status in health.values() if status.get('pid')]
+
+
+def main():
+    args = parse_args()
+    require_local(args.feed_url)
+    require_local(args.panel_url)
+
+    feed_path = f"/video_feed/{args.camera_id}" if args.camera_id else "/video_feed"
+    pids = sorted(set(server_pids(args.panel_url) + args.pid))
+
+    stop = threading.Event()
+    streams = [StreamClient(args.feed_url + feed_path, stop) for _ in range(args.streams)]
+    pollers = [Poller(args.panel_url, args.poll_interval, stop) for _ in range(args.pollers)]
+    sampler = CpuSampler(pids, stop) if pids else None
+
+    for worker in streams + pollers + ([sampler] if sampler else []):
+        worker.start()
+    started = time.perf_counter()
+    try:
+        time.sleep(args.duration)
+    except KeyboardInterrupt:
+        pass
+    stop.set()
+    elapsed = time.perf_counter() - started
+    for worker in streams + pollers:
+        worker.join(timeout=5)
+
+    stream_reports = []
+    all_gaps = []
+    for stream in streams:
+        gaps = [b - a for a, b in zip(stream.frame_times, stream.frame_times[1:])]
+        all_gaps += gaps
+        stream_reports.append({
+            'frames': len(stream.frame_times),
+            'fps': round(len(stream.frame_times) / elapsed, 2),
+            'parts': len(stream.part_times),
+            'parts_per_s': round(len(stream.part_times) / elapsed, 2),
+            'mbit_per_s': round(stream.bytes * 8 / elapsed / 1e6, 2),
+            'connect_ms': round(stream.connect_time * 1000, 2) if stream.connect_time is not None else None,
+            'error': stream.error
+        })
+
+    report = {
+        'duration_s': round(elapsed, 2),
+        'streams': {
+            'count': len(streams),
+            'total_fps': round(sum(s['fps'] for s in stream_reports), 2),
+            'total_parts_per_s': round(sum(s['parts_per_s'] for s in stream_reports), 2),
+            'per_stream': stream_reports,
+            'frame_gap_ms': summarise(all_gaps)
+        },
+        'pollers': {
+            endpoint: {
+                'requests': sum(len(p.latencies[endpoint]) for p in pollers),
+                'latency_ms': summarise([lat for p in pollers for lat in p.latencies[endpoint]])
+            }
+            for endpoint in POLL_ENDPOINTS
+        },
+        'poll_errors': sum(p.errors for p in pollers),
+        'server': {
+            'pids': pids,
+            'cpu_percent_avg': round(sum(sampler.cpu) / len(sampler.cpu), 1) if sampler and sampler.cpu else None,
+            'cpu_percent_max': round(max(sampler.cpu), 1) if sampler and sampler.cpu else None,
+            'rss_mb_max': round(max(sampler.rss) / (1024 * 1024), 1) if sampler and sampler.rss else None
+        }
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Ran {report['duration_s']}s with {args.streams} stream(s) and {args.pollers} poller(s)")
+    print(f"Video: {report['streams']['total_fps']} distinct fps total "
+          f"({report['streams']['total_parts_per_s']} parts/s), frame gap {report['streams']['frame_gap_ms']}")
+    for i, stream in enumerate(stream_reports):
+        print(f"  stream {i}: {stream['fps']} fps, {stream['parts_per_s']} parts/s, {stream['mbit_per_s']} Mbit/s"
+              + (f", error: {stream['error']}" if stream['error'] else ""))
+    for endpoint, stats in report['pollers'].items():
+        print(f"{endpoint}: {stats['requests']} requests, latency {stats['latency_ms']}")
+    print(f"Poll errors: {report['poll_errors']}")
+    server = report['server']
+    if server['pids']:
+        print(f"Server CPU: avg {server['cpu_percent_avg']}%, max {server['cpu_percent_max']}%, "
+              f"max RSS {server['rss_mb_max']} MB (pids {server['pids']})")
+    else:
+        print("Server CPU: no server PIDs found (pass --pid or start services from the control panel)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Run one light monitor per configured camera from a single host.
+
+Each camera gets its own process (frame grabbing and brightness checks are
+CPU bound, so they scale across cores instead of contending for one GIL).
+Captures are handed back over a queue to this process, where a single
+shared ``DetectionPool`` bounds concurrent and per-minute API usage for the
+whole site. Every event and inventory write is tagged with the camera id.
+Each camera process beats its own heartbeat file; one that stops beating is
+killed and restarted like a crashed one.
+"""
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+import light_capture_identify
+from camera_config import load_cameras
+from database.models import get_engine
+from detection_pool import DetectionPool
+from heartbeat import beat, set_heartbeat_file, heartbeat_age
+import profiler
+
+# Configuration
+RESTART_DELAY = 10             # Seconds before a crashed camera process is restarted
+CAMERA_HEARTBEAT_TIMEOUT = 60  # Seconds without a heartbeat before a camera process is considered hung
+CAMERA_STARTUP_GRACE = 30      # Seconds after start before camera heartbeats are enforced
+CAMERA_STOP_TIMEOUT = 5        # Seconds to wait after SIGTERM before SIGKILL
+RUN_DIR = "run"
+
+# Camera processes are spawned, not forked: restarts happen after this process
+# has started detection threads and opened database connections, and a forked
+# child would inherit those mid-use (held logging locks, pooled SQLite handles)
+_mp = multiprocessing.get_context('spawn')
+
+
+def camera_heartbeat_path(camera):
+    return os.path.abspath(os.path.join(RUN_DIR, f"camera-{camera['id']}.heartbeat"))
+
+
+def camera_worker(camera, jobs):
+    """Entry point of a per-camera process"""
+    logger = light_capture_identify.setup_logging()
+    signal.signal(signal.SIGTERM, light_capture_identify.handle_sigterm)
+    profiler.install()
+    # Beat to this camera's own file rather than the one shared with the parent
+    set_heartbeat_file(camera_heartbeat_path(camera))
+
+    def on_capture(event_id, image_path):
+        jobs.put((camera['id'], event_id, image_path))
+
+    try:
+        light_capture_identify.run_monitor(on_capture, camera['index'], camera['id'])
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        logger.critical(f"Camera {camera['id']} monitor failed: {str(e)}", exc_info=True)
+        raise
+
+
+def start_camera(camera, jobs):
+    os.makedirs(RUN_DIR, exist_ok=True)
+    heartbeat_path = camera_heartbeat_path(camera)
+    if os.path.exists(heartbeat_path):
+        os.remove(heartbeat_path)
+    process = _mp.Process(
+        target=camera_worker, args=(camera, jobs), name=f"camera-{camera['id']}", daemon=True
+    )
+    process.start()
+    return process
+
+
+def is_hung(camera, started_at):
+    if time.time() - started_at < CAMERA_STARTUP_GRACE:
+        return False
+    age = heartbeat_age(camera_heartbeat_path(camera))
+    return age is None or age > CAMERA_HEARTBEAT_TIMEOUT
+
+
+def stop_camera(process):
+    process.terminate()
+    process.join(timeout=CAMERA_STOP_TIMEOUT)
+    if process.is_alive():
+        process.kill()
+        process.join()
+
+
+def main():
+    logger = light_capture_identify.setup_logging()
+    signal.signal(signal.SIGTERM, light_capture_identify.handle_sigterm)
+    profiler.install()
+    logger.info("=== Starting Multi-Camera Fridge Monitor ===")
+
+    cameras = load_cameras()
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        logger.error("OPENAI_API_KEY not found in environment")
+        raise ValueError("OPENAI_API_KEY environment variable not set")
+
+    # Migrate here so camera processes never race each other on a fresh database
+    get_engine()
+
+    from openai import OpenAI
+    pool = DetectionPool(OpenAI(api_key=api_key))
+    jobs = _mp.Queue()
+    processes = {camera['id']: start_camera(camera, jobs) for camera in cameras}
+    started_at = {camera['id']: time.time() for camera in cameras}
+    exited_at = {}
+    logger.info(f"Started {len(processes)} camera process(es): {', '.join(processes)}")
+
+    def handle(camera_id, event_id, image_path):
+        try:
+            result = light_capture_identify.process_capture(pool, event_id, image_path, camera_id)
+            logger.info(f"Detection completed for {camera_id}: {len(result.get('items', []))} items found")
+        except Exception:
+            pass  # Already logged by process_capture
+
+    try:
+        while True:
+            beat()
+            try:
+                camera_id, event_id, image_path = jobs.get(timeout=1)
+                pool.submit(handle, camera_id, event_id, image_path)
+            except queue.Empty:
+                pass
+
+            for camera in cameras:
+                process = processes[camera['id']]
+                if process.is_alive():
+                    if not is_hung(camera, started_at[camera['id']]):
+                        continue
+                    logger.error(f"Camera {camera['id']} missed heartbeats for "
+                                 f"{CAMERA_HEARTBEAT_TIMEOUT}s, stopping it")
+                    stop_camera(process)
+                # Reap, then restart after a delay so a missing camera does not spin
+                process.join(timeout=0)
+                now = time.time()
+                if camera['id'] not in exited_at:
+                    logger.warning(f"Camera {camera['id']} process exited with code {process.exitcode}")
+                    exited_at[camera['id']] = now
+                elif now - exited_at[camera['id']] >= RESTART_DELAY:
+                    logger.info(f"Restarting camera {camera['id']}")
+                    processes[camera['id']] = start_camera(camera, jobs)
+                    started_at[camera['id']] = time.time()
+                    del exited_at[camera['id']]
+    except KeyboardInterrupt:
+        logger.info("Received shutdown signal")
+    finally:
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in processes.values():
+            process.join(timeout=5)
+        pool.shutdown(wait=False)
+        logger.info("=== Multi-Camera Fridge Monitor Stopped ===")
+
+
+if __name__ == "__main__":
+    main()
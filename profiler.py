@@ -0,0 +1,186 @@
+"""On-demand sampling profiler for supervised child processes.
+
+A child calls ``install()`` at startup, which also writes
+``run/profile-<pid>.ready``; SIGUSR1 kills a process without the handler, so
+no signal is sent to a pid without that file. To profile a child, the control
+panel writes a request file to ``run/profile-<pid>.request`` and sends ``SIGUSR1``;
+the child then samples the stacks of all its threads from a background thread
+for the requested duration and writes collapsed stacks (one
+``frame;frame;frame count`` line per distinct stack, the input format of
+flamegraph.pl and speedscope) to the requested output path. Nothing runs
+until a profile is requested.
+"""
+import atexit
+import collections
+import fcntl
+import json
+import os
+import signal
+import sys
+import threading
+import time
+
+RUN_DIR = "run"
+DEFAULT_INTERVAL = 0.005  # Seconds between stack samples
+MAX_DURATION = 60
+
+_active = threading.Lock()
+
+
+class ProfilerNotReady(RuntimeError):
+    """The target process has not installed the SIGUSR1 handler"""
+
+
+class ProfileInProgress(RuntimeError):
+    """Another profile of the same process is still running"""
+
+
+def request_path(pid):
+    return os.path.join(RUN_DIR, f"profile-{pid}.request")
+
+
+def ready_path(pid):
+    return os.path.join(RUN_DIR, f"profile-{pid}.ready")
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample_stacks(duration, interval=DEFAULT_INTERVAL):
+    """Sample every other thread's stack for ``duration`` seconds; returns {collapsed stack: count}"""
+    counts = collections.Counter()
+    own_id = threading.get_ident()
+    names = {}
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        if len(names) != threading.active_count():
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, f"thread-{thread_id}"))
+            counts[';'.join(reversed(stack))] += 1
+        time.sleep(interval)
+    return counts
+
+
+def format_collapsed(counts):
+    return ''.join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+def collapsed_to_tree(text):
+    """Convert collapsed stacks into a nested {name, value, children} tree (d3-flame-graph format)"""
+    root = {'name': 'root', 'value': 0, 'children': {}}
+    for line in text.splitlines():
+        stack, _, count = line.rpartition(' ')
+        if not stack:
+            continue
+        count = int(count)
+        node = root
+        node['value'] += count
+        for name in stack.split(';'):
+            node = node['children'].setdefault(name, {'name': name, 'value': 0, 'children': {}})
+            node['value'] += count
+
+    def finalise(node):
+        node['children'] = [finalise(child) for child in node['children'].values()]
+        return node
+    return finalise(root)
+
+
+def _run_request():
+    try:
+        with open(request_path(os.getpid())) as f:
+            request = json.load(f)
+        os.remove(request_path(os.getpid()))
+        duration = min(float(request.get('duration', 10)), MAX_DURATION)
+        counts = sample_stacks(duration, float(request.get('interval', DEFAULT_INTERVAL)))
+        output = request['output']
+        with open(output + '.tmp', 'w') as f:
+            f.write(format_collapsed(counts))
+        os.replace(output + '.tmp', output)
+    except Exception as e:
+        print(f"Profiling request failed: {str(e)}")
+    finally:
+        _active.release()
+
+
+def _handle_signal(signum, frame):
+    # Only one profile at a time; the actual sampling runs off the signal handler
+    if not _active.acquire(blocking=False):
+        return
+    threading.Thread(target=_run_request, name='profiler', daemon=True).start()
+
+
+def _remove_ready_file(pid):
+    # atexit runs in forked children too; only the installing process cleans up
+    if os.getpid() != pid:
+        return
+    try:
+        os.remove(ready_path(pid))
+    except OSError:
+        pass
+
+
+def install():
+    signal.signal(signal.SIGUSR1, _handle_signal)
+    # Advertise the handler only once it is in place
+    os.makedirs(RUN_DIR, exist_ok=True)
+    pid = os.getpid()
+    with open(ready_path(pid), 'w') as f:
+        f.write(f"{time.time()}\n")
+    atexit.register(_remove_ready_file, pid)
+
+
+def _check_ready(pid):
+    try:
+        with open(ready_path(pid)) as f:
+            installed_at = float(f.read())
+    except (OSError, ValueError):
+        raise ProfilerNotReady(f"Process {pid} has not installed the profiler")
+    import psutil
+    try:
+        created = psutil.Process(pid).create_time()
+    except psutil.Error:
+        raise ProfilerNotReady(f"Process {pid} is not running")
+    # A ready file older than the process was left by an earlier owner of the PID
+    if created > installed_at:
+        raise ProfilerNotReady(f"Process {pid} has not installed the profiler")
+
+
+def profile_process(pid, duration, interval=DEFAULT_INTERVAL, timeout_margin=10):
+    """Ask a process that called install() to profile itself; returns collapsed stacks
+
+    Raises ProfilerNotReady if the process has no handler (signalling it would
+    kill it) and ProfileInProgress if it is already being profiled.
+    """
+    os.makedirs(RUN_DIR, exist_ok=True)
+    _check_ready(pid)
+    # One profile per process: a second request would overwrite the first's request file
+    with open(request_path(pid) + '.lock', 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise ProfileInProgress(f"Process {pid} is already being profiled")
+
+        output = os.path.abspath(os.path.join(RUN_DIR, f"profile-{pid}-{int(time.time() * 1000)}.folded"))
+        with open(request_path(pid) + '.tmp', 'w') as f:
+            json.dump({'duration': duration, 'interval': interval, 'output': output}, f)
+        os.replace(request_path(pid) + '.tmp', request_path(pid))
+        os.kill(pid, signal.SIGUSR1)
+
+        deadline = time.monotonic() + duration + timeout_margin
+        while time.monotonic() < deadline:
+            if os.path.exists(output):
+                with open(output) as f:
+                    text = f.read()
+                os.remove(output)
+                return text
+            time.sleep(0.2)
+    raise TimeoutError(f"Process {pid} did not return a profile")
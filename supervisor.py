@@ -0,0 +1,287 @@
+"""Process supervisor for the control panel's child services.
+
+Each service is owned through its ``Popen`` handle, so liveness comes from
+``poll()`` (which also reaps the child) rather than from a PID that may have
+been reused. Children touch a heartbeat file (see ``heartbeat.py``); a child
+that stops beating is treated as hung and restarted. Crashed children are
+restarted with exponential backoff, stops escalate from SIGTERM to SIGKILL,
+and per-child CPU, RSS, open FDs and thread counts are sampled on every check.
+"""
+import collections
+import logging
+import os
+import subprocess
+import threading
+import time
+
+import psutil
+
+from heartbeat import HEARTBEAT_ENV, heartbeat_age
+
+# Configuration
+CHECK_INTERVAL = 2           # Seconds between health checks / resource samples
+HEARTBEAT_TIMEOUT = 60       # Seconds without a heartbeat before a child is considered hung
+STARTUP_GRACE = 30           # Seconds after start before heartbeats are enforced
+STOP_TIMEOUT = 10            # Seconds to wait after SIGTERM before SIGKILL
+BACKOFF_BASE = 1
+BACKOFF_MAX = 300
+STABLE_RUNTIME = 120         # Seconds of uptime after which the backoff resets
+SAMPLE_HISTORY = 150         # Resource samples kept per service
+RUN_DIR = "run"
+
+logger = logging.getLogger(__name__)
+
+
+class ManagedProcess:
+    def __init__(self, name, command, heartbeat_timeout=HEARTBEAT_TIMEOUT):
+        self.name = name
+        self.command = command
+        self.heartbeat_timeout = heartbeat_timeout
+        self.heartbeat_path = os.path.join(RUN_DIR, f"{name}.heartbeat")
+        self.popen = None
+        self.proc = None
+        # psutil.Process handles for descendants, kept between samples because
+        # cpu_percent() measures since the previous call on the same object
+        self.children = {}
+        self.started_at = None
+        self.restarts = 0
+        self.failures = 0
+        self.next_restart = None
+        self.last_exit_code = None
+        self.samples = collections.deque(maxlen=SAMPLE_HISTORY)
+        # Serialises stop() between the control panel and the supervisor thread
+        self.stop_lock = threading.Lock()
+
+    @property
+    def pid(self):
+        popen = self.popen  # May be cleared by a concurrent stop()
+        return popen.pid if popen else None
+
+    def start(self):
+        os.makedirs(RUN_DIR, exist_ok=True)
+        if os.path.exists(self.heartbeat_path):
+            os.remove(self.heartbeat_path)
+        env = dict(os.environ, **{HEARTBEAT_ENV: os.path.abspath(self.heartbeat_path)})
+        self.popen = subprocess.Popen(self.command, env=env)
+        self.started_at = time.time()
+        self.next_restart = None
+        self.children = {}
+        try:
+            # psutil.Process remembers the create time, so it will not
+            # mistake a recycled PID for our child
+            self.proc = psutil.Process(self.popen.pid)
+            self.proc.cpu_percent(None)
+        except psutil.Error:
+            self.proc = None
+        logger.info(f"Started {self.name} (pid {self.popen.pid})")
+
+    def is_running(self):
+        popen = self.popen  # May be cleared by a concurrent stop()
+        if popen is None:
+            return False
+        # poll() reaps the child, so exited services never linger as zombies
+        if popen.poll() is not None:
+            self.last_exit_code = popen.returncode
+            return False
+        return True
+
+    def heartbeat_age(self):
+        return heartbeat_age(self.heartbeat_path)
+
+    def is_hung(self):
+        if time.time() - self.started_at < STARTUP_GRACE:
+            return False
+        age = self.heartbeat_age()
+        return age is None or age > self.heartbeat_timeout
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """Graceful stop: SIGTERM, then SIGKILL (including grandchildren) after timeout"""
+        with self.stop_lock:
+            self._stop(timeout)
+
+    def _stop(self, timeout):
+        if not self.is_running():
+            self.popen = None
+            return
+        try:
+            children = self.proc.children(recursive=True) if self.proc else []
+        except psutil.Error:
+            children = []
+        self.popen.terminate()
+        try:
+            self.popen.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"{self.name} ignored SIGTERM for {timeout}s, killing")
+            self.popen.kill()
+            self.popen.wait()
+        for child in children:
+            try:
+                if child.is_running():
+                    child.kill()
+            except psutil.Error:
+                pass
+        self.last_exit_code = self.popen.returncode
+        self.popen = None
+        self.proc = None
+        self.children = {}
+
+    def process_tree(self):
+        """PIDs of the child and all its descendants"""
+        if self.proc is None or not self.is_running():
+            return []
+        try:
+            return [self.proc.pid] + [child.pid for child in self.proc.children(recursive=True)]
+        except psutil.Error:
+            return [self.proc.pid]
+
+    def sample(self):
+        """Record CPU, RSS, FDs and threads for the child and its descendants"""
+        if self.proc is None or not self.is_running():
+            return None
+        sample = {'time': time.time(), 'cpu_percent': 0.0, 'rss': 0, 'num_fds': 0, 'num_threads': 0}
+        try:
+            current = self.proc.children(recursive=True)
+        except psutil.Error:
+            return None
+        children = {}
+        for child in current:
+            known = self.children.get(child.pid)
+            # Process equality includes create time, so a recycled PID gets a new handle
+            if known is not None and known == child:
+                children[child.pid] = known
+            else:
+                try:
+                    child.cpu_percent(None)  # First call only primes the counter
+                except psutil.Error:
+                    continue
+                children[child.pid] = child
+        self.children = children
+        for proc in [self.proc] + list(children.values()):
+            try:
+                with proc.oneshot():
+                    sample['cpu_percent'] += proc.cpu_percent(None)
+                    sample['rss'] += proc.memory_info().rss
+                    sample['num_fds'] += proc.num_fds()
+                    sample['num_threads'] += proc.num_threads()
+            except psutil.Error:
+                continue  # Child exited between listing and sampling
+        self.samples.append(sample)
+        return sample
+
+    def status(self):
+        running = self.is_running()
+        return {
+            'running': running,
+            'pid': self.pid if running else None,
+            'uptime': time.time() - self.started_at if running else None,
+            'heartbeat_age': self.heartbeat_age() if running else None,
+            'restarts': self.restarts,
+            'last_exit_code': self.last_exit_code,
+            'next_restart_in': max(0.0, self.next_restart - time.time()) if self.next_restart else None,
+            'resources': self.samples[-1] if running and self.samples else None
+        }
+
+
+class Supervisor:
+    def __init__(self, services):
+        """services maps a service name to the command that runs it"""
+        self.services = {name: ManagedProcess(name, command) for name, command in services.items()}
+        self.desired = {name: False for name in services}
+        self.lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='supervisor', daemon=True)
+        self._thread.start()
+
+    def start(self, name):
+        with self.lock:
+            self.desired[name] = True
+            service = self.services[name]
+            if not service.is_running():
+                service.failures = 0
+                service.start()
+
+    def stop(self, name):
+        with self.lock:
+            self.desired[name] = False
+            self.services[name].next_restart = None
+        # Stop outside the lock; escalation may take STOP_TIMEOUT seconds
+        self.services[name].stop()
+
+    def is_running(self, name):
+        return self.services[name].is_running()
+
+    def is_desired(self, name):
+        """Whether the service was started and not stopped (it may be waiting to restart)"""
+        with self.lock:
+            return self.desired[name]
+
+    def status(self):
+        with self.lock:
+            return {
+                name: dict(service.status(), desired=self.desired[name])
+                for name, service in self.services.items()
+            }
+
+    def process_tree(self, name):
+        return self.services[name].process_tree()
+
+    def history(self, name):
+        return list(self.services[name].samples)
+
+    def _schedule_restart(self, service):
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** service.failures)
+        service.failures += 1
+        service.next_restart = time.time() + delay
+        logger.warning(f"{service.name} will be restarted in {delay}s")
+
+    def _check(self, service):
+        """Runs under the lock; returns True if the service is hung and must be stopped"""
+        now = time.time()
+        if service.is_running():
+            if service.is_hung():
+                return True
+            if service.failures and now - service.started_at > STABLE_RUNTIME:
+                service.failures = 0
+            service.sample()
+            return False
+
+        if service.next_restart is None:
+            logger.error(f"{service.name} exited with code {service.last_exit_code}")
+            self._schedule_restart(service)
+        elif now >= service.next_restart:
+            # Popen returns immediately, so restarts stay under the lock like start()
+            service.restarts += 1
+            service.start()
+        return False
+
+    def _stop_hung(self, name):
+        service = self.services[name]
+        logger.error(f"{name} missed heartbeats for {service.heartbeat_timeout}s, restarting")
+        # Outside the lock: escalation may take STOP_TIMEOUT seconds
+        service.stop()
+        with self.lock:
+            if self.desired[name]:
+                self._schedule_restart(service)
+
+    def _run(self):
+        while not self._stopping.wait(CHECK_INTERVAL):
+            hung = []
+            with self.lock:
+                for name, service in self.services.items():
+                    if not self.desired[name]:
+                        continue
+                    try:
+                        if self._check(service):
+                            hung.append(name)
+                    except Exception as e:
+                        logger.error(f"Supervisor check for {name} failed: {str(e)}", exc_info=True)
+            for name in hung:
+                try:
+                    self._stop_hung(name)
+                except Exception as e:
+                    logger.error(f"Stopping hung {name} failed: {str(e)}", exc_info=True)
+
+    def shutdown(self):
+        self._stopping.set()
+        for name in self.services:
+            self.stop(name)
@@ -0,0 +1,95 @@
+import gzip
+import os
+import shutil
+import threading
+
+from detection_log import DetectionLog, write_snapshot
+
+
+def timestamps(records):
+    return [record['ts'] for record in records]
+
+
+def test_read_range_is_half_open(tmp_path):
+    log = DetectionLog(str(tmp_path))
+    for ts in (10.0, 11.0, 12.0, 13.0):
+        log.append({'ts': ts})
+
+    assert timestamps(log.read_range(11, 13)) == [11.0, 12.0]
+    assert timestamps(log.read_range(None, 11)) == [10.0]
+    assert timestamps(log.read_range(13, None)) == [13.0]
+    assert timestamps(log.read_range()) == [10.0, 11.0, 12.0, 13.0]
+
+
+def test_out_of_order_timestamps_are_not_lost(tmp_path):
+    log = DetectionLog(str(tmp_path))
+    for ts in (10.0, 11.0, 9.0, 12.0):
+        log.append({'ts': ts})
+
+    # The late record is indexed at the last timestamp rather than breaking the sort
+    assert timestamps(log.read_range()) == [10.0, 11.0, 11.0, 12.0]
+    assert timestamps(log.read_range(10, 13)) == [10.0, 11.0, 11.0, 12.0]
+    assert timestamps(log.read_range(11, 12)) == [11.0, 11.0]
+
+
+def test_rotation_compresses_segments_and_reads_across_them(tmp_path):
+    log = DetectionLog(str(tmp_path), max_bytes=200)
+    for i in range(20):
+        log.append({'ts': 1000.0 + i, 'items': ['milk']})
+
+    segments = log._segments()
+    assert segments
+    assert all(path.endswith('.jsonl.gz') for _, _, path, _ in segments)
+    assert timestamps(log.read_range()) == [1000.0 + i for i in range(20)]
+    assert timestamps(log.read_range(1005, 1015)) == [1000.0 + i for i in range(5, 15)]
+
+
+def test_rotation_by_age(tmp_path):
+    log = DetectionLog(str(tmp_path), max_age=60)
+    log.append({'ts': 1000.0})
+    log.append({'ts': 1100.0})
+
+    assert len(log._segments()) == 1
+    assert timestamps(log.read_range()) == [1000.0, 1100.0]
+
+
+def test_segment_bounds_cover_sub_millisecond_timestamps(tmp_path):
+    log = DetectionLog(str(tmp_path))
+    log.append({'ts': 1010.0})
+    log.append({'ts': 1011.0005})
+    log._compress(log._rotate())
+    log.append({'ts': 1012.0})
+
+    assert timestamps(log.read_range(1011.0003, 1013)) == [1011.0005, 1012.0]
+
+
+def test_half_compressed_segment_is_read_once(tmp_path):
+    log = DetectionLog(str(tmp_path))
+    log.append({'ts': 1.0})
+    segment = log._rotate()
+    # State between os.replace and os.remove in _compress
+    with open(segment, 'rb') as src, gzip.open(segment + '.gz', 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+
+    assert timestamps(log.read_range()) == [1.0]
+
+
+def test_snapshot_is_atomic_across_threads(tmp_path):
+    path = str(tmp_path / 'snapshot.json')
+    errors = []
+
+    def writer(n):
+        for i in range(50):
+            try:
+                write_snapshot({'writer': n, 'i': i}, path)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert os.listdir(str(tmp_path)) == ['snapshot.json']
@@ -0,0 +1,121 @@
+import os
+import sys
+
+import pytest
+
+from image_sync import LocalTransport, SSHTransport, PART_SUFFIX, sync_images
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.fixture
+def source(tmp_path):
+    root = tmp_path / 'remote'
+    write(str(root / 'a.jpg'), b'a' * 1000)
+    write(str(root / 'objects' / 'ab' / 'cd' / 'b.jpg'), os.urandom(5000))
+    return str(root)
+
+
+class RecordingTransport(LocalTransport):
+    def __init__(self, root):
+        super().__init__(root)
+        self.fetches = []
+
+    def fetch(self, rel, dest, offset=0):
+        self.fetches.append((rel, offset))
+        super().fetch(rel, dest, offset)
+
+
+def test_local_sync_is_incremental(source, tmp_path):
+    dest = str(tmp_path / 'local')
+    transport = RecordingTransport(source)
+
+    summary = sync_images(transport, dest)
+    assert summary['transferred'] == 2 and not summary['failed']
+    assert read(os.path.join(dest, 'objects/ab/cd/b.jpg')) == read(os.path.join(source, 'objects/ab/cd/b.jpg'))
+
+    summary = sync_images(transport, dest)
+    assert summary['transferred'] == 0 and summary['skipped'] == 2
+
+    write(os.path.join(source, 'a.jpg'), b'changed')
+    summary = sync_images(transport, dest)
+    assert summary['transferred'] == 1
+    assert read(os.path.join(dest, 'a.jpg')) == b'changed'
+
+
+def test_partial_download_is_resumed(source, tmp_path):
+    dest = str(tmp_path / 'local')
+    data = read(os.path.join(source, 'objects/ab/cd/b.jpg'))
+    write(os.path.join(dest, 'objects/ab/cd/b.jpg') + PART_SUFFIX, data[:1234])
+    transport = RecordingTransport(source)
+
+    sync_images(transport, dest)
+
+    assert ('objects/ab/cd/b.jpg', 1234) in transport.fetches
+    assert read(os.path.join(dest, 'objects/ab/cd/b.jpg')) == data
+    assert not os.path.exists(os.path.join(dest, 'objects/ab/cd/b.jpg') + PART_SUFFIX)
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='needs a POSIX shell')
+def test_ssh_transport_with_local_shell(source, tmp_path):
+    dest = str(tmp_path / 'local')
+    # sh -c behaves like "ssh host <command>" against the local filesystem
+    transport = SSHTransport(None, None, source, ssh_command=['sh', '-c'])
+    data = read(os.path.join(source, 'objects/ab/cd/b.jpg'))
+    write(os.path.join(dest, 'objects/ab/cd/b.jpg') + PART_SUFFIX, data[:100])
+
+    summary = sync_images(transport, dest)
+
+    assert summary['transferred'] == 2 and not summary['failed']
+    assert read(os.path.join(dest, 'objects/ab/cd/b.jpg')) == data
+    assert read(os.path.join(dest, 'a.jpg')) == b'a' * 1000
+
+
+def test_ssh_transport_fetches_each_batch_over_one_connection(tmp_path):
+    source = tmp_path / 'remote'
+    for i in range(10):
+        write(str(source / 'objects' / f'{i:02d}' / f'{i}.jpg'), os.urandom(300 + i))
+    calls = tmp_path / 'calls'
+    # Log every "connection", then run the remote command it was given
+    transport = SSHTransport(None, None, str(source),
+                             ssh_command=['sh', '-c', f'echo x >> {calls}; eval "$0"'])
+
+    summary = sync_images(transport, str(tmp_path / 'local'), batch_size=4)
+
+    assert summary['transferred'] == 10 and not summary['failed']
+    # One for the manifest plus one per batch of four
+    assert len(read(str(calls)).splitlines()) == 1 + 3
+    for i in range(10):
+        rel = os.path.join('objects', f'{i:02d}', f'{i}.jpg')
+        assert read(str(tmp_path / 'local' / rel)) == read(str(source / rel))
+
+
+def test_manifest_entries_outside_root_are_rejected(source, tmp_path):
+    dest = str(tmp_path / 'local')
+
+    class HostileTransport(LocalTransport):
+        def manifest(self):
+            manifest = super().manifest()
+            manifest['../escaped.jpg'] = manifest['a.jpg']
+            manifest[os.path.join(str(tmp_path), 'absolute.jpg')] = manifest['a.jpg']
+            return manifest
+
+        def fetch(self, rel, dest, offset=0):
+            # Serve real bytes for the hostile entries so only the path check can stop them
+            super().fetch('a.jpg' if rel.endswith(('escaped.jpg', 'absolute.jpg')) else rel, dest, offset)
+
+    summary = sync_images(HostileTransport(source), dest)
+
+    assert sorted(summary['failed']) == sorted(['../escaped.jpg', os.path.join(str(tmp_path), 'absolute.jpg')])
+    assert not os.path.exists(tmp_path / 'escaped.jpg')
+    assert not os.path.exists(tmp_path / 'absolute.jpg')
+    assert read(os.path.join(dest, 'a.jpg')) == b'a' * 1000